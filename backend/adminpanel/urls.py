@@ -1,6 +1,6 @@
 from django.urls import path,include
 from rest_framework.routers import DefaultRouter
-from .views import StudentViewset,InstructorViewset,AdminOrderViewSet,AdminDashboardAPIView
+from .views import StudentViewset,InstructorViewset,AdminOrderViewSet,AdminDashboardAPIView,CacheStatsAPIView,LiveEventStatsAPIView
 
 router = DefaultRouter()
 router.register(r'students',StudentViewset,basename='students')
@@ -11,6 +11,8 @@ router.register(r'orders',AdminOrderViewSet,basename="orders")
 urlpatterns = [
 
     path('dashboard/',AdminDashboardAPIView.as_view()),
+    path('cache-stats/',CacheStatsAPIView.as_view()),
+    path('live-event-stats/',LiveEventStatsAPIView.as_view()),
     
     path('',include(router.urls)),
 ]
\ No newline at end of file
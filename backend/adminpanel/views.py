@@ -17,6 +17,8 @@ from users.models import CustomUser
 from courses.models import Course
 from payment.models import CoursePurchase
 from revenue.models import PlatformRevenue
+from pytech.cache import get_cache_stats
+from livesession.services import get_live_event_stats
 
 class StudentViewset(viewsets.ModelViewSet):
     queryset = CustomUser.objects.filter(role='student')
@@ -97,3 +99,15 @@ class AdminDashboardAPIView(APIView):
             "monthly_courses":monthly_courses
         })
 
+
+class CacheStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self,request):
+        return Response(get_cache_stats())
+
+class LiveEventStatsAPIView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self,request):
+        return Response(get_live_event_stats())
@@ -1,9 +1,11 @@
 import json
 import logging
+import redis
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.cache import cache
-from .serializers import MessageSerializer
+from .utils import encode_chat_message, mark_room_read, room_notification_group
+from payment.utils import is_course_member
+from pytech.redis_client import get_async_redis
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +29,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
 
         self.room_group_name = f"course_chat_{self.room.id}"
-        self.user_room_key = f"user_{self.user.id}_room_{self.room.id}"
+        self.user_room_key = f"chat:joined:{self.user.id}:{self.room.id}"
 
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -38,11 +40,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         logger.info(f"User {self.user.username} successfully connected to room {self.room_id}")
 
-        has_joined = cache.get(self.user_room_key)
-        
-        if not has_joined:
-            cache.set(self.user_room_key, True, timeout=86400)
-            
+        first_join = await self.mark_joined()
+
+        if first_join:
             await self.send_system_message(
                 f"{self.user.username} joined the community"
             )
@@ -50,6 +50,13 @@ class ChatConsumer(AsyncWebsocketConsumer):
         else:
             logger.info(f"User {self.user.username} reconnected to room {self.room_id}")
 
+    async def mark_joined(self):
+        try:
+            return bool(await get_async_redis().set(self.user_room_key, 1, ex=86400, nx=True))
+        except redis.RedisError as e:
+            logger.warning(f"Could not record join for {self.user_room_key}: {e}")
+            return False
+
     async def disconnect(self, close_code):
         logger.info(f"User {getattr(self.user, 'username', 'Unknown')} disconnected from room {getattr(self, 'room_id', 'Unknown')} with code {close_code}")
         
@@ -64,16 +71,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get("type", "chat_message")
 
-            if message_type == "file_message":
-                message_id = data.get("message_id")
+            if message_type == "mark_read":
+                await database_sync_to_async(mark_room_read)(self.room.id, self.user.id)
+                return
 
-                message = await self.get_message_by_id(message_id)
-                if not message:
+            if message_type == "file_message":
+                frame = await self.load_message_frame(data.get("message_id"))
+                if not frame:
                     return
 
                 await self.channel_layer.group_send(
                     self.room_group_name,
-                    {"type": "chat_message", "message": await self.serialize_message(message)}
+                    {"type": "chat_message", "text": frame}
                 )
                 return
             
@@ -92,26 +101,19 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 logger.warning(f"Empty message received from {self.user.username}")
                 return
             
-            reply_to_id = data.get("reply_to_id")
-            message = await self.save_message(content)
-            participants = await self.get_participants(message)
-
-            await self.create_chat_notifications(message,participants)
-
-            for user_id in participants:
-                await self.channel_layer.group_send(
-                    f"user_{user_id}",
-                    {
-                        "type": "chat_notification",
-                        "room_id": str(self.room.id),
-                    }
-                )
+            frame = await self.create_message_frame(content, reply_to_id=data.get("reply_to_id"))
 
             await self.channel_layer.group_send(
                 self.room_group_name,
+                {"type": "chat_message", "text": frame}
+            )
+
+            await self.channel_layer.group_send(
+                room_notification_group(self.room.id),
                 {
-                    "type": "chat_message",
-                    "message": await self.serialize_message(message)
+                    "type": "chat_notification",
+                    "room_id": str(self.room.id),
+                    "sender_id": self.user.id,
                 }
             )
 
@@ -131,10 +133,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }))
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "chat_message",
-            "message": event["message"]
-        }))
+        # Frames are encoded once by the sender and forwarded as-is to every socket.
+        await self.send(text_data=event["text"])
 
     async def chat_notification(self, event):
         pass    
@@ -149,10 +149,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 is_active=True
             )
 
-            if (
-                room.course.purchases.filter(student_id=self.user.id).exists()
-                or room.course.instructor_id == self.user.id
-            ):
+            if is_course_member(room.course, self.user.id):
+                mark_room_read(room.id, self.user.id)
                 return room
 
             logger.warning(f"User {self.user.username} not authorized for room {self.room_id}")
@@ -163,102 +161,40 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None
 
     @database_sync_to_async
-    def save_message(self, content, reply_to_id=None):
+    def create_message_frame(self, content, reply_to_id=None, is_system=False):
         from .models import Message
+
         reply_to = None
         if reply_to_id:
-            try:
-                reply_to = Message.objects.get(id=reply_to_id)
-            except Message.DoesNotExist:
-                pass
-        return Message.objects.create(
+            reply_to = Message.objects.select_related("sender").filter(
+                id=reply_to_id,
+                room=self.room
+            ).first()
+
+        message = Message.objects.create(
             room=self.room,
             sender=self.user,
             content=content,
             reply_to=reply_to,
+            is_system=is_system,
         )
+        return encode_chat_message(message)
 
     @database_sync_to_async
-    def get_message_by_id(self, message_id):
+    def load_message_frame(self, message_id):
         from .models import Message
-        try:
-            return Message.objects.select_related(
-                "sender", "room", "reply_to__sender"
-            ).get(id=message_id)
-        except Message.DoesNotExist:
-            return None
-    
-    @database_sync_to_async
-    def serialize_message(self, message):
-        from .serializers import MessageSerializer
-        data = MessageSerializer(message).data
-        
-        return {
-            "id": str(message.id),
-            "content": message.content,
-            "file": data.get("file"),
-            "file_type": message.file_type,
-            "sender": {
-                "id": message.sender.id,
-                "username": message.sender.username,
-            },
-            "created_at": message.created_at.isoformat(),
-            "is_system": message.is_system,
-        }
-    
-    @database_sync_to_async
-    def get_participants(self, message):
-
-        room = message.room
-        sender = message.sender
-
-        participants = set()
-
-        students = room.course.purchases.values_list("student", flat=True)
-        participants.update(students)
-
-        participants.add(room.course.instructor_id)
 
-        participants.discard(sender.id)
+        message = Message.objects.select_related(
+            "sender", "reply_to__sender"
+        ).filter(id=message_id, room=self.room).first()
+        return encode_chat_message(message) if message else None
 
-        return list(participants)
-    
-    @database_sync_to_async
-    def create_chat_notifications(self, message, participants):
-        from instrpanel.models import Notification
-
-        notifications = [
-            Notification(
-                user_id=user_id,
-                title="New chat message",
-                message=f"{message.sender.username}: {message.content[:50] if message.content else 'sent a file'}",
-                notification_type="chat",
-            )
-            for user_id in participants
-        ]
-
-        Notification.objects.bulk_create(notifications)
-    
-    @database_sync_to_async
-    def create_system_message(self, text):
-        from .models import Message
-
-        return Message.objects.create(
-            room=self.room,
-            sender=self.user,
-            content=text,
-            is_system=True
-        )
-    
     async def send_system_message(self, text):
-        message = await self.create_system_message(text)
+        frame = await self.create_message_frame(text, is_system=True)
 
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                "type": "chat_message",
-                "message": await self.serialize_message(message)
-            }
+            {"type": "chat_message", "text": frame}
         )
 
 class UserNotificationConsumer(AsyncWebsocketConsumer):
@@ -270,24 +206,47 @@ class UserNotificationConsumer(AsyncWebsocketConsumer):
             return
 
         self.group_name = f"user_{self.user.id}"
+        self.room_groups = [
+            room_notification_group(room_id) for room_id in await self.get_room_ids()
+        ]
 
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        for group in [self.group_name, *self.room_groups]:
+            await self.channel_layer.group_add(
+                group,
+                self.channel_name
+            )
 
         await self.accept()
 
     async def disconnect(self, close_code):
         if hasattr(self, "group_name"):
-            await self.channel_layer.group_discard(
-                self.group_name,
-                self.channel_name
-            )
+            for group in [self.group_name, *self.room_groups]:
+                await self.channel_layer.group_discard(
+                    group,
+                    self.channel_name
+                )
+
+    @database_sync_to_async
+    def get_room_ids(self):
+        from django.db.models import Q
+        from .models import ChatRoom
+
+        return list(
+            ChatRoom.objects.filter(is_active=True).filter(
+                Q(course__purchases__student=self.user) |
+                Q(course__instructor=self.user)
+            ).values_list("id", flat=True).distinct()
+        )
 
     async def chat_notification(self, event):
+        if event.get("sender_id") == self.user.id:
+            return
+
         await self.send(text_data=json.dumps({
             "event": "new_message",
             "room_id": event["room_id"],
         }))
+
+    async def notify_message(self, event):
+        await self.send(text_data=json.dumps(event["payload"]))
   
\ No newline at end of file
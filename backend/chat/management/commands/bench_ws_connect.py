@@ -0,0 +1,80 @@
+import asyncio
+import statistics
+import time
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import CustomUser
+from users.serializers import CustomTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Open N concurrent chat sockets against the ASGI app in-process and report connect throughput. "
+        "Run it on two checkouts against the same Redis/Postgres to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("room", help="Chat room id to connect to.")
+        parser.add_argument("--user", type=int, required=True, help="Id of a member of the room.")
+        parser.add_argument("--sockets", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--timeout", type=float, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(id=options["user"])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        token = str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+        latencies, failures, elapsed = async_to_sync(self.run)(
+            f"/ws/chat/{options['room']}/?token={token}",
+            options["sockets"],
+            options["concurrency"],
+            options["timeout"],
+        )
+
+        connected = len(latencies)
+        self.stdout.write(f"sockets: {options['sockets']}  connected: {connected}  failed: {failures}")
+        self.stdout.write(f"elapsed: {elapsed:.2f}s  throughput: {connected / elapsed:.1f} connects/s")
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f"latency p50: {statistics.median(latencies) * 1000:.1f}ms  "
+                f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms  "
+                f"max: {latencies[-1] * 1000:.1f}ms"
+            )
+
+    async def run(self, path, sockets, concurrency, timeout):
+        from pytech.asgi import application
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        communicators = []
+        failures = 0
+
+        async def connect():
+            nonlocal failures
+            async with semaphore:
+                communicator = WebsocketCommunicator(application, path)
+                started = time.perf_counter()
+                try:
+                    connected, _ = await communicator.connect(timeout=timeout)
+                except asyncio.TimeoutError:
+                    connected = False
+
+                if connected:
+                    latencies.append(time.perf_counter() - started)
+                    communicators.append(communicator)
+                else:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect() for _ in range(sockets)))
+        elapsed = time.perf_counter() - started
+
+        # Sockets stay open until every connect finished so they are truly concurrent.
+        await asyncio.gather(*(communicator.disconnect() for communicator in communicators))
+        return latencies, failures, elapsed
@@ -7,6 +7,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+PRINCIPAL_CLAIMS = ("username", "role", "is_staff")
+
 
 class JWTAuthMiddleware(BaseMiddleware):
 
@@ -19,8 +21,7 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         return await super().__call__(scope, receive, send)
 
-    @database_sync_to_async
-    def get_user_from_token(self, token):
+    async def get_user_from_token(self, token):
         from django.contrib.auth import get_user_model
         from django.contrib.auth.models import AnonymousUser
 
@@ -33,8 +34,46 @@ class JWTAuthMiddleware(BaseMiddleware):
                 settings.SECRET_KEY,
                 algorithms=["HS256"],
             )
-            User = get_user_model()
-            return User.objects.get(id=payload["user_id"])
+            user_id = get_user_model()._meta.pk.to_python(payload["user_id"])
         except Exception as e:
             logger.warning(f"WS auth failed: {e}")
             return AnonymousUser()
+
+        if all(claim in payload for claim in PRINCIPAL_CLAIMS):
+            return self.build_principal(user_id, payload)
+
+        # Tokens issued before the claims were added fall back to a cached lookup.
+        fields = await self.get_cached_user_fields(user_id)
+        if fields is None:
+            return AnonymousUser()
+        return self.build_principal(user_id, fields)
+
+    def build_principal(self, user_id, claims):
+        from django.contrib.auth import get_user_model
+
+        # Unsaved instance carrying only what consumers read; usable as an FK value without a query.
+        return get_user_model()(
+            id=user_id,
+            username=claims["username"],
+            email=claims.get("email", ""),
+            role=claims["role"],
+            is_staff=claims["is_staff"],
+        )
+
+    @database_sync_to_async
+    def get_cached_user_fields(self, user_id):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache
+        from users.utils import get_ws_user_cache_key
+
+        key = get_ws_user_cache_key(user_id)
+        fields = cache.get(key)
+        if fields is None:
+            fields = get_user_model().objects.filter(id=user_id).values(
+                "username", "email", "role", "is_staff"
+            ).first()
+            if fields is None:
+                logger.warning(f"WS auth failed: user {user_id} not found")
+                return None
+            cache.set(key, fields, settings.WS_AUTH_USER_CACHE_TIMEOUT)
+        return fields
@@ -54,3 +54,15 @@ class Message(models.Model):
     def __str__(self):
         return f"{self.sender} : {self.content[:30]}"
 
+
+class ChatRoomReadState(models.Model):
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_states')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_read_states')
+    last_read_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'chat_room_read_states'
+        unique_together = ('room', 'user')
+
+    def __str__(self):
+        return f"{self.user} read {self.room_id} at {self.last_read_at}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import ChatRoom, Message
+from .utils import get_message_file_url, get_unread_count
 
 User = get_user_model()
 class UserSerializer(serializers.ModelSerializer):
@@ -32,18 +33,8 @@ class MessageSerializer(serializers.ModelSerializer):
             "reply_to",
         ]
 
-    def get_correct_cloudinary_url(self,file_field, file_type):
-        if not file_field:
-            return None
-
-        url = file_field.url  
-        if file_type in ("video", "audio"):
-            return url.replace("/auto/upload/", "/video/upload/")
-        else: 
-            return url.replace("/auto/upload/", "/image/upload/")        
-
     def get_file(self, obj):
-        return self.get_correct_cloudinary_url(obj.file, obj.file_type)    
+        return get_message_file_url(obj.file, obj.file_type)
 
     def get_reply_to(self, obj):
         if obj.reply_to:
@@ -103,9 +94,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         return None
     
     def get_unread_count(self, obj):
-        user = self.context["request"].user
-        return obj.messages.filter(
-            is_system=False,
-            is_read=False
-        ).exclude(sender=user).count()
+        if hasattr(obj, "unread_messages"):
+            return obj.unread_messages
+        return get_unread_count(obj, self.context["request"].user)
 
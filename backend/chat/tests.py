@@ -1,3 +1,140 @@
+import json
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from courses.models import Course
+from instrpanel.models import Notification
+from payment.models import CoursePurchase
+from users.models import CustomUser
+from users.serializers import CustomTokenObtainPairSerializer
+from .middleware import JWTAuthMiddleware
+from .models import ChatRoom, Message
+from .serializers import MessageSerializer
+from .utils import encode_chat_message
+
+
+class ChatUnreadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.course = course = Course.objects.create(title="Django", description="", instructor=instructor)
+        self.room = ChatRoom.objects.get(course=course)
+        self.students = []
+        for index in range(3):
+            student = CustomUser.objects.create_user(
+                email=f"student{index}@example.com", username=f"student{index}", password="pass"
+            )
+            CoursePurchase.objects.create(student=student, course=course)
+            self.students.append(student)
+
+    def unread_count(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/chat/rooms/")
+        return response.data["results"][0]["unread_count"]
+
+    def test_message_send_does_not_write_per_participant_rows(self):
+        self.client.force_authenticate(self.students[0])
+        for text in ["hello", "anyone?"]:
+            response = self.client.post(f"/api/chat/rooms/{self.room.id}/upload/", {"content": text})
+            self.assertEqual(response.status_code, 201)
+
+        self.assertFalse(Notification.objects.filter(notification_type="chat").exists())
+        self.assertEqual(self.unread_count(self.students[1]), 2)
+        self.assertEqual(self.unread_count(self.students[0]), 0)
+
+        self.client.force_authenticate(self.students[1])
+        self.client.get(f"/api/chat/rooms/{self.room.id}/messages/")
+        self.assertEqual(self.unread_count(self.students[1]), 0)
+        self.assertEqual(self.unread_count(self.students[2]), 2)
+
+    def test_enrollment_check_is_cached_and_refreshed_on_purchase(self):
+        outsider = CustomUser.objects.create_user(
+            email="outsider@example.com", username="outsider", password="pass"
+        )
+        self.client.force_authenticate(outsider)
+        url = f"/api/chat/rooms/{self.room.id}/read/"
+
+        self.assertEqual(self.client.post(url).status_code, 403)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(url).status_code, 403)
+
+        CoursePurchase.objects.create(student=outsider, course=self.course)
+        self.assertEqual(self.client.post(url).status_code, 200)
+
+    def test_message_history_walks_back_with_keyset_cursors(self):
+        Message.objects.bulk_create([
+            Message(room=self.room, sender=self.students[0], content=f"message {index}")
+            for index in range(120)
+        ])
+        self.client.force_authenticate(self.students[1])
+        url = f"/api/chat/rooms/{self.room.id}/messages/"
+
+        seen = []
+        params = {"page_size": 50}
+        while True:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params)
+            self.assertFalse(any("COUNT(" in query["sql"] for query in ctx.captured_queries))
+            seen.extend(message["id"] for message in response.data["results"])
+            if not response.data["before"]:
+                break
+            params["before"] = response.data["before"]
+
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+        response = self.client.get(url, {"page_size": 50, "after": params["before"]})
+        self.assertEqual(len(response.data["results"]), 50)
+        self.assertIsNotNone(response.data["after"])
+
+    def test_broadcast_frame_matches_rest_serializer(self):
+        original = Message.objects.create(room=self.room, sender=self.students[0], content="question")
+        reply = Message.objects.create(
+            room=self.room, sender=self.students[1], content="answer", reply_to=original
+        )
+
+        frame = json.loads(encode_chat_message(reply))
+        data = MessageSerializer(reply).data
+
+        self.assertEqual(frame["type"], "chat_message")
+        for field in ("content", "file", "file_type", "is_system", "reply_to"):
+            self.assertEqual(frame["message"][field], data[field])
+        self.assertEqual(frame["message"]["sender"]["username"], data["sender"]["username"])
+
+
+class JWTAuthMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+        self.middleware = JWTAuthMiddleware(None)
+
+    def resolve(self, token):
+        return async_to_sync(self.middleware.get_user_from_token)(str(token))
+
+    def test_principal_is_built_from_claims_without_queries(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+
+        with self.assertNumQueries(0):
+            user = self.resolve(token)
+
+        self.assertEqual((user.id, user.username, user.role), (self.user.id, "student", "student"))
+        self.assertTrue(user.is_authenticated)
+
+    def test_token_without_claims_uses_cached_lookup(self):
+        token = AccessToken.for_user(self.user)
+
+        self.assertEqual(self.resolve(token).username, "student")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolve(token).username, "student")
+
+        self.assertFalse(self.resolve("not-a-token").is_authenticated)
@@ -6,4 +6,5 @@ urlpatterns = [
     path('rooms/<uuid:id>/', views.ChatRoomDetailView.as_view(), name='chat-room-detail'),
     path('rooms/<uuid:room_id>/messages/', views.MessageListView.as_view(), name='message-list'),
     path("rooms/<uuid:room_id>/upload/", views.ChatFileUploadView.as_view(), name='upload'),
+    path("rooms/<uuid:room_id>/read/", views.MarkRoomReadView.as_view(), name='mark-room-read'),
 ]
\ No newline at end of file
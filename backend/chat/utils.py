@@ -0,0 +1,85 @@
+import json
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import ChatRoomReadState
+
+
+def room_notification_group(room_id):
+    return f"chat_notify_{room_id}"
+
+def mark_room_read(room_id, user_id):
+    ChatRoomReadState.objects.update_or_create(
+        room_id=room_id,
+        user_id=user_id,
+        defaults={"last_read_at": timezone.now()}
+    )
+
+def annotate_unread_counts(rooms, user):
+    return rooms.annotate(
+        last_read_at=Subquery(
+            ChatRoomReadState.objects.filter(
+                room=OuterRef("pk"),
+                user=user
+            ).values("last_read_at")[:1]
+        )
+    ).annotate(
+        unread_messages=Count(
+            "messages",
+            filter=Q(messages__is_system=False)
+            & ~Q(messages__sender=user)
+            & (Q(last_read_at__isnull=True) | Q(messages__created_at__gt=F("last_read_at"))),
+            distinct=True
+        )
+    )
+
+def get_unread_count(room, user):
+    state = ChatRoomReadState.objects.filter(room=room, user=user).first()
+    messages = room.messages.filter(is_system=False).exclude(sender=user)
+    if state:
+        messages = messages.filter(created_at__gt=state.last_read_at)
+    return messages.count()
+
+def notify_room(room_id, sender_id):
+    async_to_sync(get_channel_layer().group_send)(
+        room_notification_group(room_id),
+        {
+            "type": "chat_notification",
+            "room_id": str(room_id),
+            "sender_id": sender_id,
+        },
+    )
+
+def get_message_file_url(file_field, file_type):
+    if not file_field:
+        return None
+
+    url = file_field.url
+    if file_type in ("video", "audio"):
+        return url.replace("/auto/upload/", "/video/upload/")
+    return url.replace("/auto/upload/", "/image/upload/")
+
+def encode_chat_message(message):
+    reply_to = message.reply_to
+    return json.dumps({
+        "type": "chat_message",
+        "message": {
+            "id": str(message.id),
+            "content": message.content,
+            "file": get_message_file_url(message.file, message.file_type),
+            "file_type": message.file_type,
+            "sender": {
+                "id": message.sender.id,
+                "username": message.sender.username,
+            },
+            "created_at": message.created_at.isoformat(),
+            "is_system": message.is_system,
+            "reply_to": {
+                "id": str(reply_to.id),
+                "sender": reply_to.sender.username,
+                "content": reply_to.content[:80],
+            } if reply_to else None,
+        },
+    })
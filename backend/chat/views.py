@@ -1,11 +1,17 @@
 from rest_framework import generics, permissions
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination
+from rest_framework.exceptions import NotFound
 from django.contrib.auth import get_user_model
 from django.db.models import Max,Q
 from django.shortcuts import get_object_or_404
 from .models import ChatRoom, Message
 from .serializers import ChatRoomSerializer, MessageSerializer
+from .utils import annotate_unread_counts, mark_room_read, notify_room
+from payment.utils import is_course_member
+import base64
 import logging
+import uuid
+from datetime import datetime
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
@@ -14,11 +20,67 @@ logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
-class MessagePagination(PageNumberPagination):
+class MessageCursorPagination(BasePagination):
+    """Keyset pagination on (created_at, id), newest first, without COUNT or OFFSET."""
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, message):
+        raw = f"{message.created_at.isoformat()}|{message.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        size = self.get_page_size(request)
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+
+        if after:
+            created_at, pk = self.decode_cursor(after)
+            messages = list(
+                queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                ).order_by("created_at", "id")[:size + 1]
+            )
+            self.has_newer = len(messages) > size
+            self.has_older = True
+            messages = messages[:size][::-1]
+        else:
+            if before:
+                created_at, pk = self.decode_cursor(before)
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            messages = list(queryset.order_by("-created_at", "-id")[:size + 1])
+            self.has_older = len(messages) > size
+            self.has_newer = bool(before)
+            messages = messages[:size]
+
+        self.messages = messages
+        return messages
+
+    def get_paginated_response(self, data):
+        messages = self.messages
+        return Response({
+            "before": self.encode_cursor(messages[-1]) if messages and self.has_older else None,
+            "after": self.encode_cursor(messages[0]) if messages and self.has_newer else None,
+            "results": data,
+        })
+
 class MyCourseChatRoomsView(generics.ListAPIView):
     serializer_class = ChatRoomSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -30,7 +92,7 @@ class MyCourseChatRoomsView(generics.ListAPIView):
             f"User {student.id} fetching their chat rooms"
         )
 
-        return (
+        rooms = (
             ChatRoom.objects
             .filter(is_active=True)
             .filter(
@@ -40,9 +102,8 @@ class MyCourseChatRoomsView(generics.ListAPIView):
             .annotate(
                 last_message_time=Max("messages__created_at")
             )
-            .order_by("-last_message_time")
-            .distinct()
         )
+        return annotate_unread_counts(rooms, student).order_by("-last_message_time").distinct()
 
 class ChatRoomDetailView(generics.RetrieveAPIView):
     serializer_class = ChatRoomSerializer
@@ -67,7 +128,7 @@ class ChatRoomDetailView(generics.RetrieveAPIView):
 class MessageListView(generics.ListAPIView):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = MessagePagination
+    pagination_class = MessageCursorPagination
 
     def get_queryset(self):
         room_id = self.kwargs["room_id"]
@@ -75,7 +136,7 @@ class MessageListView(generics.ListAPIView):
         
         try:
             room = get_object_or_404(
-                ChatRoom,
+                ChatRoom.objects.select_related("course"),
                 id=room_id,
                 is_active=True
             )
@@ -84,20 +145,18 @@ class MessageListView(generics.ListAPIView):
                 f"User {user.id} requesting messages for room {room_id}"
             )
 
-            if not (
-                room.course.purchases.filter(student_id=user.id).exists()
-                or room.course.instructor_id == user.id
-            ):
+            if not is_course_member(room.course, user.id):
                 logger.warning(
                     f"Unauthorized access attempt: "
                     f"User {user.id} tried accessing room {room_id}"
                 )
                 return Message.objects.none()
 
+            self.room = room
             return room.messages.select_related(
                 "sender",
-                "reply_to"
-            ).order_by("-created_at")
+                "reply_to__sender"
+            )
         
         except Exception as e:
             logger.error(
@@ -106,6 +165,32 @@ class MessageListView(generics.ListAPIView):
             )
             raise
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        is_latest_page = not (request.query_params.get("before") or request.query_params.get("after"))
+        if getattr(self, "room", None) and is_latest_page:
+            mark_room_read(self.room.id, request.user.id)
+
+        return response
+
+class MarkRoomReadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, room_id):
+        room = get_object_or_404(
+            ChatRoom.objects.select_related("course"),
+            id=room_id,
+            is_active=True
+        )
+
+        user = request.user
+        if not is_course_member(room.course, user.id):
+            return Response({"error": "Not authorized"}, status=403)
+
+        mark_room_read(room.id, user.id)
+        return Response({"unread_count": 0})
+
 class ChatFileUploadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -121,10 +206,7 @@ class ChatFileUploadView(APIView):
 
         user = request.user
 
-        is_student = room.course.purchases.filter(student=user).exists()
-        is_instructor = room.course.instructor_id == user.id
-
-        if not (is_student or is_instructor):
+        if not is_course_member(room.course, user.id):
             return Response({"error": "Not authorized"}, status=403)
 
         file = request.FILES.get("file")
@@ -178,42 +260,7 @@ class ChatFileUploadView(APIView):
             reply_to=reply_to,
         )
 
-        participants = set()
-
-        students = room.course.purchases.values_list("student", flat=True)
-        participants.update(students)
-
-        participants.add(room.course.instructor_id)
-
-        participants.discard(user.id)
-
-        from instrpanel.models import Notification
-
-        notifications = [
-            Notification(
-                user_id=user_id,
-                title="New chat message",
-                message=f"{user.username}: {content[:50] if content else 'sent a file'}",
-                notification_type="chat",
-            )
-            for user_id in participants
-        ]
-
-        Notification.objects.bulk_create(notifications)
-
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
-        channel_layer = get_channel_layer()
-
-        for user_id in participants:
-            async_to_sync(channel_layer.group_send)(
-                f"user_{user_id}",
-                {
-                    "type": "chat_notification",
-                    "room_id": str(room.id),
-                },
-            )
+        notify_room(room.id, user.id)
 
         return Response(
             {"message": MessageSerializer(message, context={"request": request}).data},
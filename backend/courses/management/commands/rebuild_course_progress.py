@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from courses.utils import rebuild_course_progress
+from payment.models import CoursePurchase
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized CourseProgress rows from LessonProgress."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, help="Only rebuild purchases of this course id.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        purchases = CoursePurchase.objects.only("id").order_by("id")
+        if options["course"]:
+            purchases = purchases.filter(course_id=options["course"])
+
+        batch_size = options["batch_size"]
+        batch = []
+        rebuilt = 0
+
+        for purchase in purchases.iterator(chunk_size=batch_size):
+            batch.append(purchase)
+            if len(batch) >= batch_size:
+                rebuilt += len(rebuild_course_progress(batch))
+                batch = []
+
+        if batch:
+            rebuilt += len(rebuild_course_progress(batch))
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt progress for {rebuilt} purchases."))
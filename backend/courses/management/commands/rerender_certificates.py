@@ -0,0 +1,47 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from courses.models import CourseCertificate
+from courses.tasks import rerender_certificates_task
+from courses.utils import rerender_certificates
+from pytech.utils import iter_chunks
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render and re-upload certificate PDFs, e.g. after a course rename or a design change. "
+        "By default the chunks are fanned out to Celery workers; --sync renders them in this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, help="Only re-render certificates of this course id.")
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--sync", action="store_true", help="Render in-process and report throughput.")
+        parser.add_argument("--workers", type=int, default=settings.CERTIFICATE_UPLOAD_CONCURRENCY)
+
+    def handle(self, *args, **options):
+        if not options["sync"]:
+            result = rerender_certificates_task.delay(options["course"], options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"Queued certificate re-render as task {result.id}."))
+            return
+
+        certificates = CourseCertificate.objects.all()
+        if options["course"]:
+            certificates = certificates.filter(course_id=options["course"])
+        total = certificates.count()
+
+        started = time.perf_counter()
+        rendered = failed = 0
+        certificate_ids = certificates.order_by("id").values_list("id", flat=True)
+        for chunk in iter_chunks(certificate_ids, options["chunk_size"]):
+            ok, errors = rerender_certificates(chunk, options["workers"])
+            rendered += ok
+            failed += errors
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{rendered + failed}/{total}  {rendered / elapsed:.1f} certificates/s")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-rendered {rendered} certificates ({failed} failed) in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_lessonprogress_watched_seconds'),
+        ('payment', '0005_alter_invoice_pdf_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_lessons', models.PositiveIntegerField(default=0)),
+                ('total_lessons', models.PositiveIntegerField(default=0)),
+                ('percentage', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('purchase', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='payment.coursepurchase')),
+            ],
+        ),
+    ]
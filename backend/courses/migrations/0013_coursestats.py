@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_course_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseStats = apps.get_model('courses', 'CourseStats')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Review = apps.get_model('courses', 'Review')
+    CoursePurchase = apps.get_model('payment', 'CoursePurchase')
+
+    reviews = {
+        row['course_id']: row
+        for row in Review.objects.values('course_id').annotate(count=Count('id'), avg=Avg('rating'))
+    }
+    lessons = {
+        row['module__course_id']: row
+        for row in Lesson.objects.filter(is_deleted=False, module__is_deleted=False)
+        .values('module__course_id').annotate(count=Count('id'), duration=Sum('duration'))
+    }
+    enrollments = dict(
+        CoursePurchase.objects.values('course_id').annotate(count=Count('id')).values_list('course_id', 'count')
+    )
+
+    stats = []
+    for course_id in Course.objects.values_list('id', flat=True):
+        review = reviews.get(course_id, {})
+        lesson = lessons.get(course_id, {})
+        stats.append(CourseStats(
+            course_id=course_id,
+            avg_rating=review.get('avg'),
+            review_count=review.get('count', 0),
+            lesson_count=lesson.get('count', 0),
+            total_duration=lesson.get('duration') or 0,
+            enrolled_count=enrollments.get(course_id, 0),
+        ))
+    CourseStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_courseprogress'),
+        ('payment', '0005_alter_invoice_pdf_file'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='courses.course')),
+                ('avg_rating', models.FloatField(blank=True, db_index=True, null=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveIntegerField(default=0)),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('enrolled_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+def backfill_certificate_status(apps, schema_editor):
+    CourseCertificate = apps.get_model("courses", "CourseCertificate")
+    CourseCertificate.objects.exclude(certificate_file__isnull=True).exclude(certificate_file="").update(status="ready")
+    # Without a file and with no render queued, failed lets a download re-queue them.
+    CourseCertificate.objects.exclude(status="ready").update(status="failed")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_coursestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursecertificate',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_certificate_status, migrations.RunPython.noop),
+    ]
@@ -153,7 +153,41 @@ class LessonProgress(models.Model):
             models.Index(fields=['lesson']),
         ]
         
+class CourseProgress(models.Model):
+    purchase = models.OneToOneField("payment.CoursePurchase",on_delete=models.CASCADE,related_name="progress")
+    completed_lessons = models.PositiveIntegerField(default=0)
+    total_lessons = models.PositiveIntegerField(default=0)
+    percentage = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def refresh_percentage(self):
+        if self.total_lessons == 0:
+            self.percentage = 0
+        else:
+            self.percentage = round((self.completed_lessons / self.total_lessons) * 100, 2)
+
+    def __str__(self):
+        return f"{self.purchase_id} - {self.percentage}%"
+        
+class CourseStats(models.Model):
+    course = models.OneToOneField(Course,on_delete=models.CASCADE,primary_key=True,related_name="stats")
+    avg_rating = models.FloatField(null=True,blank=True,db_index=True)
+    review_count = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveIntegerField(default=0)
+    lesson_count = models.PositiveIntegerField(default=0)
+    enrolled_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.course_id} - {self.avg_rating} ({self.review_count})"
+
 class CourseCertificate(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     student = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -162,6 +196,7 @@ class CourseCertificate(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     certificate_id = models.CharField(max_length=20, unique=True)
     certificate_file = models.FileField(upload_to="certificates/",storage=MediaCloudinaryStorage(),null=True,blank=True)
+    status = models.CharField(max_length=10,choices=STATUS_CHOICES,default='pending')
     issued_at = models.DateTimeField()
 
     class Meta:
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from .models import (Course,CourseCategory,Module, Lesson,LessonResource,LessonProgress,CourseCertificate,Review)
 from django.db import transaction
 from users.serializers import ProfileSerializer
-from .utils import get_course_progress
+from .utils import get_viewer_context
 from livesession.models import LiveSession
 from livesession.serializers import LiveSessionSerializer
 from quiz.serializers import QuizSerializer
@@ -26,6 +26,8 @@ class InstructorCourseSerializer(serializers.ModelSerializer):
     avg_rating = serializers.FloatField(read_only=True)
     review_count = serializers.IntegerField(read_only=True)
     total_duration = serializers.IntegerField(read_only=True)
+    lesson_count = serializers.IntegerField(read_only=True)
+    enrolled_count = serializers.IntegerField(read_only=True)
     final_quiz = serializers.SerializerMethodField()
 
     class Meta:
@@ -33,7 +35,7 @@ class InstructorCourseSerializer(serializers.ModelSerializer):
         fields = [
             'id','title','description','category','category_name','level','price','course_image',
             'status','updated_at','instructor_profile','avg_rating','review_count','total_duration',
-            'final_quiz',
+            'lesson_count','enrolled_count','final_quiz',
         ]
         read_only_fields = ['status']
 
@@ -116,30 +118,22 @@ class LessonSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        request = self.context.get('request')
+        viewer = get_viewer_context(self.context)
 
-        if not request or not request.user.is_authenticated:
+        if not viewer.is_authenticated:
             if not instance.is_preview:
                 data['video_url'] = None
                 data['text_content'] = None
                 data['resources'] = []
             return data
         
-        user = request.user
-        if user.is_staff or getattr(user, 'role', None) in ['admin', 'instructor']:
+        if viewer.is_privileged:
             return data
         
         if instance.is_preview:
             return data
-        try:
-            from payment.models import CoursePurchase
-            has_purchased = CoursePurchase.objects.filter(
-                student=user, course=instance.module.course
-            ).exists()
-        except Exception:
-            has_purchased = False
 
-        if not has_purchased:
+        if not viewer.has_purchased(instance.module.course_id):
                 data['video_url'] = None
                 data['text_content'] = None
                 data['resources'] = []
@@ -170,15 +164,11 @@ class LessonSerializer(serializers.ModelSerializer):
         return data
     
     def get_completed(self, lesson):
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
+        viewer = get_viewer_context(self.context)
+        if not viewer.is_authenticated:
             return False
 
-        return LessonProgress.objects.filter(
-            student=request.user,
-            lesson=lesson,
-            completed=True
-        ).exists()
+        return lesson.id in viewer.completed_lesson_ids(lesson.module.course_id)
 
 class ModuleSerializer(serializers.ModelSerializer):
     lessons = serializers.SerializerMethodField()
@@ -198,7 +188,9 @@ class ModuleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
     def get_lessons(self, obj):
-        lessons = obj.lessons.filter(is_deleted=False)
+        lessons = getattr(obj, "visible_lessons", None)
+        if lessons is None:
+            lessons = obj.lessons.filter(is_deleted=False)
         return LessonSerializer(lessons, many=True, context=self.context).data
     
 class AdminCourseSerializer(serializers.ModelSerializer):
@@ -210,13 +202,15 @@ class AdminCourseSerializer(serializers.ModelSerializer):
     avg_rating = serializers.FloatField(read_only=True)
     review_count = serializers.IntegerField(read_only=True)
     total_duration = serializers.IntegerField(read_only=True)
+    lesson_count = serializers.IntegerField(read_only=True)
+    enrolled_count = serializers.IntegerField(read_only=True)
     final_quiz = serializers.SerializerMethodField()
 
     class Meta:
         model=Course
         fields=['id','title','price','level','status','is_active','is_published','admin_feedback','instructor_username',
                 'category_name','created_at','course_image','category','updated_at','instructor_profile','avg_rating',
-                'review_count','total_duration','final_quiz',]  
+                'review_count','total_duration','lesson_count','enrolled_count','final_quiz',]  
         read_only_fields = fields
 
     def validate_category(self,value):
@@ -293,35 +287,30 @@ class UserCourseDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_purchased(self, obj):
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
-            return False
-        return obj.purchases.filter(student=request.user).exists()    
+        return get_viewer_context(self.context).has_purchased(obj.id)
 
     def get_modules(self, obj):
-        request = self.context.get("request")
-        certificate = None
+        viewer = get_viewer_context(self.context)
+        issued_at = viewer.certificates.get(obj.id)
 
-        if request and request.user.is_authenticated:
-            certificate = CourseCertificate.objects.filter(
-                student=request.user,
-                course=obj
-            ).first()
+        modules = getattr(obj, "visible_modules", None)
+        if modules is None:
+            modules = obj.modules.filter(is_active=True, is_deleted=False)
 
         modules = ModuleSerializer(
-            obj.modules.filter(is_active=True, is_deleted=False),
+            modules,
             many=True,
             context=self.context
         ).data
 
-        if certificate:
+        if issued_at:
             for module in modules:
                 for lesson in module.get("lessons", []):
                     lesson_obj_created = lesson.get("created_at")
 
                     if lesson_obj_created:
                         lesson["is_new"] = (
-                            lesson_obj_created > certificate.issued_at.isoformat()
+                            lesson_obj_created > issued_at.isoformat()
                         )
                     else:
                         lesson["is_new"] = False
@@ -351,8 +340,7 @@ class UserCourseDetailSerializer(serializers.ModelSerializer):
             return QuizSerializer(quiz, context=self.context).data
 
         if getattr(user, 'role', None) == "student":
-            has_purchased = obj.purchases.filter(student=user).exists()
-            if has_purchased:
+            if get_viewer_context(self.context).has_purchased(obj.id):
                 return QuizSerializer(quiz, context=self.context).data
 
         return None
@@ -364,9 +352,9 @@ class UserCourseDetailSerializer(serializers.ModelSerializer):
         return ProfileSerializer(profile).data
     
     def get_progress_percentage(self, obj):
-        request = self.context.get('request', None)
-        if request and request.user.is_authenticated:
-            return get_course_progress(request.user, obj)
+        viewer = get_viewer_context(self.context)
+        if viewer.is_authenticated:
+            return viewer.get_progress_map([obj.id]).get(obj.id, 0)
         return None
     
     def get_live_session(self, obj):
@@ -386,12 +374,72 @@ class UserCourseDetailSerializer(serializers.ModelSerializer):
             "scheduled_at": session.scheduled_at,
             "allow_early_join": session.allow_early_join,
         }
+
+class CourseCatalogListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        courses = list(data.all() if hasattr(data, "all") else data)
+        viewer = get_viewer_context(self.context)
+        if viewer.is_authenticated:
+            self.context["catalog_progress"] = viewer.get_progress_map([course.id for course in courses])
+        return super().to_representation(courses)
+
+class CourseCatalogSerializer(serializers.ModelSerializer):
+    instructor_username = serializers.CharField(source="instructor.username", read_only=True)
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    course_image = serializers.ImageField(read_only=True, use_url=True)
+    avg_rating = serializers.FloatField(read_only=True)
+    review_count = serializers.IntegerField(read_only=True)
+    total_duration = serializers.IntegerField(read_only=True)
+    is_purchased = serializers.SerializerMethodField()
+    progress_percentage = serializers.SerializerMethodField()
+    has_certificate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Course
+        list_serializer_class = CourseCatalogListSerializer
+        fields = [
+            "id",
+            "title",
+            "description",
+            "price",
+            "level",
+            "course_image",
+            "updated_at",
+            "instructor_username",
+            "category_name",
+            "avg_rating",
+            "review_count",
+            "total_duration",
+            "is_purchased",
+            "progress_percentage",
+            "has_certificate",
+        ]
+        read_only_fields = fields
+
+    def get_is_purchased(self, obj):
+        return get_viewer_context(self.context).has_purchased(obj.id)
+
+    def get_progress_percentage(self, obj):
+        if not get_viewer_context(self.context).is_authenticated:
+            return None
+        return self.context.get("catalog_progress", {}).get(obj.id, 0)
+
+    def get_has_certificate(self, obj):
+        return obj.id in get_viewer_context(self.context).certificates
+
 class LessonProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = LessonProgress 
         fields = ['id','student','lesson','completed','completed_at','watched_seconds'] 
         read_only_fields = ['id','studet','lesson']
 
+class WatchHeartbeatSerializer(serializers.Serializer):
+    lesson_id = serializers.IntegerField()
+    watched_seconds = serializers.IntegerField(min_value=0)
+
+class WatchHeartbeatBatchSerializer(serializers.Serializer):
+    heartbeats = WatchHeartbeatSerializer(many=True, allow_empty=False, max_length=200)
+
 class CertificateSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseCertificate
@@ -399,6 +447,7 @@ class CertificateSerializer(serializers.ModelSerializer):
             "certificate_id",
             "course",
             "certificate_file",
+            "status",
             "issued_at",
         ]
         read_only_fields = fields
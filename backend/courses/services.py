@@ -0,0 +1,215 @@
+import logging
+import time
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from pytech.redis_client import get_redis
+from .models import Lesson, LessonProgress
+from .utils import record_lesson_completion
+
+logger = logging.getLogger(__name__)
+
+WATCH_BUFFER_KEY = "watch_progress:pending"
+WATCH_FLUSHING_KEY = "watch_progress:flushing"
+CERTIFICATE_RERENDER_KEY = "certificates:rerender"
+COMPLETION_RATIO = 0.9
+
+# Keep only the highest watched_seconds per (student, lesson) field.
+_BUFFER_MAX_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or tonumber(ARGV[2]) > tonumber(current) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+_buffer_max = None
+
+
+def _get_buffer_script(client):
+    global _buffer_max
+    if _buffer_max is None:
+        _buffer_max = client.register_script(_BUFFER_MAX_SCRIPT)
+    return _buffer_max
+
+def is_completion(lesson, watched_seconds):
+    return bool(lesson.duration) and lesson.duration > 0 and watched_seconds >= lesson.duration * COMPLETION_RATIO
+
+def write_watch_progress(student, lesson, watched_seconds):
+    with transaction.atomic():
+        progress, _ = LessonProgress.objects.select_for_update().get_or_create(
+            student=student,
+            lesson=lesson
+        )
+
+        if watched_seconds > progress.watched_seconds:
+            progress.watched_seconds = watched_seconds
+
+        just_completed = False
+        if not progress.completed and is_completion(lesson, progress.watched_seconds):
+            progress.completed = True
+            progress.completed_at = timezone.now()
+            just_completed = True
+        progress.save()
+
+        if just_completed:
+            record_lesson_completion(student, lesson)
+    return progress
+
+def buffer_watch_progress(student_id, watched):
+    client = get_redis()
+    script = _get_buffer_script(client)
+    pipe = client.pipeline(transaction=False)
+
+    for lesson_id, seconds in watched.items():
+        script(keys=[WATCH_BUFFER_KEY], args=[f"{student_id}:{lesson_id}", seconds], client=pipe)
+    pipe.execute()
+
+def ingest_watch_heartbeats(student, heartbeats):
+    watched = {}
+    for item in heartbeats:
+        lesson_id = int(item["lesson_id"])
+        watched[lesson_id] = max(watched.get(lesson_id, 0), int(item["watched_seconds"]))
+
+    lessons = Lesson.objects.select_related("module").in_bulk(watched.keys())
+    stored = {
+        lesson_id: (seconds, completed)
+        for lesson_id, seconds, completed in LessonProgress.objects.filter(
+            student=student,
+            lesson_id__in=lessons.keys()
+        ).values_list("lesson_id", "watched_seconds", "completed")
+    }
+
+    results = []
+    pending = {}
+
+    for lesson_id, seconds in watched.items():
+        lesson = lessons.get(lesson_id)
+        if not lesson:
+            continue
+
+        stored_seconds, completed = stored.get(lesson_id, (0, False))
+        best = max(seconds, stored_seconds)
+
+        if not completed and is_completion(lesson, best):
+            progress = write_watch_progress(student, lesson, best)
+            best, completed = progress.watched_seconds, progress.completed
+        elif seconds > stored_seconds:
+            pending[lesson_id] = seconds
+
+        results.append({
+            "lesson_id": lesson_id,
+            "watched_seconds": best,
+            "completed": completed
+        })
+
+    if pending:
+        if settings.WATCH_PROGRESS_BUFFER_ENABLED:
+            try:
+                buffer_watch_progress(student.id, pending)
+                pending = {}
+            except redis.RedisError as e:
+                logger.warning(f"Watch progress buffer unavailable, writing directly: {e}")
+
+        for lesson_id, seconds in pending.items():
+            write_watch_progress(student, lessons[lesson_id], seconds)
+
+    return results
+
+def flush_watch_progress(batch_size=1000):
+    client = get_redis()
+
+    if not client.exists(WATCH_FLUSHING_KEY):
+        try:
+            client.rename(WATCH_BUFFER_KEY, WATCH_FLUSHING_KEY)
+        except redis.ResponseError:
+            return 0
+
+    entries = client.hgetall(WATCH_FLUSHING_KEY)
+    watched = {}
+    for field, seconds in entries.items():
+        student_id, lesson_id = field.split(":")
+        watched[(int(student_id), int(lesson_id))] = int(seconds)
+
+    items = list(watched.items())
+    for start in range(0, len(items), batch_size):
+        _write_watch_batch(dict(items[start:start + batch_size]))
+
+    client.delete(WATCH_FLUSHING_KEY)
+    return len(items)
+
+def _write_watch_batch(watched):
+    student_ids = {student_id for student_id, _ in watched}
+    lesson_ids = set(
+        Lesson.objects.filter(
+            id__in={lesson_id for _, lesson_id in watched}
+        ).values_list("id", flat=True)
+    )
+
+    with transaction.atomic():
+        existing = {
+            (progress.student_id, progress.lesson_id): progress
+            for progress in LessonProgress.objects.select_for_update().filter(
+                student_id__in=student_ids,
+                lesson_id__in=lesson_ids
+            )
+        }
+
+        to_update = []
+        to_create = []
+        for (student_id, lesson_id), seconds in watched.items():
+            if lesson_id not in lesson_ids:
+                continue
+
+            progress = existing.get((student_id, lesson_id))
+            if progress is None:
+                to_create.append(
+                    LessonProgress(student_id=student_id, lesson_id=lesson_id, watched_seconds=seconds)
+                )
+            elif seconds > progress.watched_seconds:
+                progress.watched_seconds = seconds
+                to_update.append(progress)
+
+        LessonProgress.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+
+        # A row created concurrently wins the insert; apply the buffered maximum to it instead.
+        wanted = {(progress.student_id, progress.lesson_id): progress.watched_seconds for progress in to_create}
+        if wanted:
+            for progress in LessonProgress.objects.select_for_update().filter(
+                student_id__in={student_id for student_id, _ in wanted},
+                lesson_id__in={lesson_id for _, lesson_id in wanted}
+            ):
+                seconds = wanted.get((progress.student_id, progress.lesson_id))
+                if seconds is not None and seconds > progress.watched_seconds:
+                    progress.watched_seconds = seconds
+                    to_update.append(progress)
+
+        LessonProgress.objects.bulk_update(to_update, ["watched_seconds"], batch_size=500)
+
+def start_rerender_metrics(total):
+    try:
+        get_redis().hset(CERTIFICATE_RERENDER_KEY, mapping={
+            "total": total, "rendered": 0, "failed": 0, "started_at": time.time()
+        })
+    except redis.RedisError as e:
+        logger.debug(f"Could not record certificate re-render metrics: {e}")
+
+def record_rerender_metrics(rendered, failed):
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(CERTIFICATE_RERENDER_KEY, "rendered", rendered)
+            pipe.hincrby(CERTIFICATE_RERENDER_KEY, "failed", failed)
+            pipe.hmget(CERTIFICATE_RERENDER_KEY, "total", "started_at")
+            rendered, failed, (total, started_at) = pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Could not record certificate re-render metrics: {e}")
+        return None
+
+    elapsed = time.time() - float(started_at or time.time())
+    return {
+        "total": int(total or 0),
+        "rendered": rendered,
+        "failed": failed,
+        "per_second": round(rendered / elapsed, 1) if elapsed > 0 else 0,
+    }
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Course, CourseCategory, CourseStats, Module, Lesson, LessonResource, Review
+from .tasks import refresh_course_progress_task
+from .utils import rebuild_course_progress, refresh_course_stats, adjust_enrolled_count
+from payment.models import CoursePurchase
+from pytech.cache import invalidate_tags
+
+
+def _course_is_being_deleted(kwargs):
+    return isinstance(kwargs.get("origin"), Course)
+
+@receiver(post_save, sender=CoursePurchase)
+def create_course_progress(sender, instance, created, **kwargs):
+    if created:
+        rebuild_course_progress([instance])
+        adjust_enrolled_count(instance.course_id, 1)
+
+@receiver(post_delete, sender=CoursePurchase)
+def purchase_deleted(sender, instance, **kwargs):
+    if not _course_is_being_deleted(kwargs):
+        adjust_enrolled_count(instance.course_id, -1)
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    try:
+        course_id = instance.module.course_id
+    except Module.DoesNotExist:
+        return
+
+    if not _course_is_being_deleted(kwargs):
+        refresh_course_stats(course_id, content=True)
+    invalidate_tags("catalog", f"course:{course_id}")
+    transaction.on_commit(
+        lambda: refresh_course_progress_task.delay(course_id)
+    )
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    if kwargs.get("created"):
+        CourseStats.objects.get_or_create(course=instance)
+    invalidate_tags("catalog", f"course:{instance.id}")
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, **kwargs):
+    if not _course_is_being_deleted(kwargs):
+        refresh_course_stats(instance.course_id, content=True)
+    invalidate_tags("catalog", f"course:{instance.course_id}")
+
+@receiver(post_save, sender=LessonResource)
+@receiver(post_delete, sender=LessonResource)
+def lesson_resource_changed(sender, instance, **kwargs):
+    try:
+        course_id = instance.lesson.module.course_id
+    except (Lesson.DoesNotExist, Module.DoesNotExist):
+        return
+
+    invalidate_tags(f"course:{course_id}")
+
+@receiver(post_save, sender=CourseCategory)
+@receiver(post_delete, sender=CourseCategory)
+def category_changed(sender, instance, **kwargs):
+    invalidate_tags("categories", "catalog", "course_detail")
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    if not _course_is_being_deleted(kwargs):
+        refresh_course_stats(instance.course_id, reviews=True)
+    invalidate_tags(
+        "reviews",
+        f"reviews:{instance.course_id}",
+        "catalog",
+        f"course:{instance.course_id}"
+    )
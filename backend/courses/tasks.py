@@ -1,8 +1,20 @@
-from celery import shared_task
+from celery import group, shared_task
+import logging
+import time
+import redis
+from datetime import timedelta
 from django.core.mail import send_mail
+from django.core.cache import cache
 from django.conf import settings
-from .models import Course,LessonResource
+from django.utils import timezone
+from .models import Course,CourseCertificate,LessonResource
+from .utils import generate_certificate_file,rebuild_course_progress,rerender_certificates
+from .services import flush_watch_progress,record_rerender_metrics,start_rerender_metrics
+from payment.models import CoursePurchase
 from ai.pdf_ingestion import index_lesson_resource
+from pytech.utils import iter_chunks
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def send_course_status_email(course_id):
@@ -43,4 +55,110 @@ def index_lesson_resource_task(resource_id):
     except LessonResource.DoesNotExist:
         print("Resource not found:", resource_id)
     except Exception as e:
-        print("Indexing failed:", e)        
\ No newline at end of file
+        print("Indexing failed:", e)
+
+@shared_task
+def refresh_course_progress_task(course_id, batch_size=500):
+    purchases = list(
+        CoursePurchase.objects.filter(course_id=course_id, progress_locked=False).only("id")
+    )
+
+    for start in range(0, len(purchases), batch_size):
+        rebuild_course_progress(purchases[start:start + batch_size])
+
+@shared_task
+def flush_watch_progress_task():
+    flushed = flush_watch_progress()
+    if flushed:
+        logger.info(f"Flushed {flushed} buffered watch progress entries")
+
+@shared_task(bind=True, max_retries=5)
+def generate_certificate_task(self, certificate_id):
+    try:
+        certificate = CourseCertificate.objects.select_related("student", "course").get(id=certificate_id)
+    except CourseCertificate.DoesNotExist:
+        return
+
+    if certificate.status == "ready" and certificate.certificate_file:
+        return
+
+    try:
+        generate_certificate_file(certificate)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Certificate {certificate.certificate_id} generation failed (attempt {self.request.retries + 1}): {e}")
+            raise self.retry(exc=e, countdown=settings.CERTIFICATE_RETRY_DELAY * 2 ** self.request.retries)
+
+        logger.error(f"Certificate {certificate.certificate_id} generation failed after retries: {e}")
+        CourseCertificate.objects.filter(id=certificate.id, status="pending").update(status="failed")
+        return
+
+    logger.info(f"Certificate {certificate.certificate_id} generated for user {certificate.student_id}")
+
+def certificate_queued_key(certificate_id):
+    return f"certificate_queued:{certificate_id}"
+
+def _delay_certificate(certificate_id):
+    # Called after commit; with no broker the certificate is marked failed so a download re-queues it.
+    try:
+        generate_certificate_task.delay(certificate_id)
+    except Exception as e:
+        logger.error(f"Could not queue certificate {certificate_id} generation: {e}")
+        CourseCertificate.objects.filter(id=certificate_id, status="pending").update(status="failed")
+
+def queue_certificate_generation(certificate_id):
+    try:
+        cache.set(certificate_queued_key(certificate_id), 1, timeout=settings.CERTIFICATE_STALE_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not mark certificate {certificate_id} as queued: {e}")
+    _delay_certificate(certificate_id)
+
+def requeue_stale_certificate(certificate_id):
+    # At most one re-queue per stale window, however many requests or sweeps ask for it.
+    try:
+        queued = cache.add(certificate_queued_key(certificate_id), 1, timeout=settings.CERTIFICATE_STALE_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not re-queue certificate {certificate_id}: {e}")
+        return
+    if queued:
+        logger.warning(f"Re-queueing stale pending certificate {certificate_id}")
+        _delay_certificate(certificate_id)
+
+def is_stale(certificate):
+    return certificate.issued_at < timezone.now() - timedelta(seconds=settings.CERTIFICATE_STALE_SECONDS)
+
+@shared_task
+def requeue_stale_certificates_task():
+    cutoff = timezone.now() - timedelta(seconds=settings.CERTIFICATE_STALE_SECONDS)
+    for certificate_id in CourseCertificate.objects.filter(status="pending", issued_at__lt=cutoff).values_list("id", flat=True):
+        requeue_stale_certificate(certificate_id)
+
+@shared_task
+def rerender_certificates_task(course_id=None, chunk_size=200):
+    certificates = CourseCertificate.objects.all()
+    if course_id:
+        certificates = certificates.filter(course_id=course_id)
+
+    total = certificates.count()
+    start_rerender_metrics(total)
+    certificate_ids = certificates.order_by("id").values_list("id", flat=True)
+    group(
+        rerender_certificates_chunk_task.s(chunk)
+        for chunk in iter_chunks(certificate_ids, chunk_size)
+    ).apply_async()
+
+    logger.info(f"Queued re-render of {total} certificates (course={course_id})")
+    return total
+
+@shared_task
+def rerender_certificates_chunk_task(certificate_ids):
+    started = time.perf_counter()
+    rendered, failed = rerender_certificates(certificate_ids, settings.CERTIFICATE_UPLOAD_CONCURRENCY)
+    elapsed = time.perf_counter() - started
+
+    metrics = record_rerender_metrics(rendered, failed)
+    logger.info(
+        f"Re-rendered {rendered} certificates ({failed} failed) in {elapsed:.2f}s"
+        + (f" | overall {metrics['rendered']}/{metrics['total']} at {metrics['per_second']}/s" if metrics else "")
+    )
+    return rendered, failed
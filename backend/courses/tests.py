@@ -1,3 +1,257 @@
-from django.test import TestCase
+import io
+import redis
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from payment.models import CoursePurchase
+from users.models import CustomUser
+from .models import (
+    Course, CourseCategory, CourseCertificate, CourseProgress, CourseStats, Module, Lesson, LessonProgress, Review
+)
+from .services import WATCH_BUFFER_KEY, flush_watch_progress
+from .tasks import refresh_course_progress_task, rerender_certificates_task
+from .utils import get_course_progress
+
+
+class CourseProgressFixtureMixin:
+    def setUp(self):
+        self.client = APIClient()
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.student = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+        self.course = Course.objects.create(
+            title="Django",
+            description="",
+            instructor=instructor,
+            category=CourseCategory.objects.create(name="Web"),
+            status="approved",
+            is_published=True,
+        )
+        module = Module.objects.create(course=self.course, title="Basics")
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f"Lesson {index}", content_type="text", duration=100)
+            for index in range(4)
+        ]
+        self.purchase = CoursePurchase.objects.create(student=self.student, course=self.course)
+        self.client.force_authenticate(self.student)
+
+
+class CourseProgressTests(CourseProgressFixtureMixin, TestCase):
+    def watch(self, lesson, seconds):
+        return self.client.post(
+            f"/api/lesson-progress/lessons/{lesson.id}/watch/",
+            {"watched_seconds": seconds},
+            format="json",
+        )
+
+    def test_purchase_creates_progress_record(self):
+        progress = CourseProgress.objects.get(purchase=self.purchase)
+        self.assertEqual((progress.completed_lessons, progress.total_lessons), (0, 4))
+
+    def test_completion_increments_progress_once(self):
+        self.watch(self.lessons[0], 95)
+        self.watch(self.lessons[0], 100)
+
+        progress = CourseProgress.objects.get(purchase=self.purchase)
+        self.assertEqual(progress.completed_lessons, 1)
+        self.assertEqual(get_course_progress(self.student, self.course), 25)
+
+    def test_soft_deleted_lesson_is_dropped_from_total(self):
+        self.watch(self.lessons[0], 100)
+        self.lessons[3].is_deleted = True
+        self.lessons[3].save(update_fields=["is_deleted"])
+
+        refresh_course_progress_task(self.course.id)
+
+        progress = CourseProgress.objects.get(purchase=self.purchase)
+        self.assertEqual((progress.completed_lessons, progress.total_lessons), (1, 3))
+        self.assertEqual(progress.percentage, 33.33)
+
+    def test_watch_batch_coalesces_heartbeats_and_completes_promptly(self):
+        response = self.client.post(
+            "/api/lesson-progress/watch-batch/",
+            {"heartbeats": [
+                {"lesson_id": self.lessons[0].id, "watched_seconds": 30},
+                {"lesson_id": self.lessons[0].id, "watched_seconds": 95},
+                {"lesson_id": self.lessons[1].id, "watched_seconds": 10},
+                {"lesson_id": 999999, "watched_seconds": 10},
+            ]},
+            format="json",
+        )
+
+        results = {item["lesson_id"]: item for item in response.data["results"]}
+        self.assertEqual(set(results), {self.lessons[0].id, self.lessons[1].id})
+        self.assertTrue(results[self.lessons[0].id]["completed"])
+        self.assertEqual(results[self.lessons[0].id]["watched_seconds"], 95)
+        self.assertFalse(results[self.lessons[1].id]["completed"])
+        self.assertEqual(CourseProgress.objects.get(purchase=self.purchase).completed_lessons, 1)
+
+
+class FakeWatchBufferRedis:
+    # Just the hash commands the watch buffer uses; the script applies the same max-merge as the Lua source.
+    def __init__(self):
+        self.hashes = {}
+
+    def register_script(self, source):
+        def script(keys, args, client=None):
+            field, seconds = args
+            current = self.hashes.setdefault(keys[0], {}).get(field)
+            if current is None or int(seconds) > int(current):
+                self.hashes[keys[0]][field] = str(seconds)
+        return script
+
+    def pipeline(self, transaction=True):
+        return mock.Mock(execute=mock.Mock(return_value=[]))
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def rename(self, source, destination):
+        if source not in self.hashes:
+            raise redis.ResponseError("no such key")
+        self.hashes[destination] = self.hashes.pop(source)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+
+
+@override_settings(WATCH_PROGRESS_BUFFER_ENABLED=True)
+class WatchProgressBufferTests(CourseProgressFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeWatchBufferRedis()
+        self.enterContext(mock.patch("courses.services.get_redis", return_value=self.redis))
+        self.enterContext(mock.patch("courses.services._buffer_max", None))
+
+    def send(self, *heartbeats):
+        self.client.post(
+            "/api/lesson-progress/watch-batch/",
+            {"heartbeats": [{"lesson_id": lesson.id, "watched_seconds": seconds} for lesson, seconds in heartbeats]},
+            format="json",
+        )
+
+    def watched(self, lesson):
+        return LessonProgress.objects.filter(student=self.student, lesson=lesson).values_list("watched_seconds", flat=True).first()
+
+    def test_buffered_heartbeats_flush_their_maximum(self):
+        LessonProgress.objects.create(student=self.student, lesson=self.lessons[1], watched_seconds=5)
+        self.send((self.lessons[0], 20), (self.lessons[1], 30))
+        self.send((self.lessons[0], 60), (self.lessons[1], 10))
+        self.send((self.lessons[0], 40))
+
+        self.assertIsNone(self.watched(self.lessons[0]))
+        self.assertEqual(self.watched(self.lessons[1]), 5)
+
+        self.assertEqual(flush_watch_progress(), 2)
+        self.assertEqual((self.watched(self.lessons[0]), self.watched(self.lessons[1])), (60, 30))
+        self.assertEqual(self.redis.hashes, {})
+        self.assertEqual(flush_watch_progress(), 0)
+
+    def test_row_created_during_flush_takes_the_buffered_maximum(self):
+        self.send((self.lessons[2], 70))
+        bulk_create = LessonProgress.objects.bulk_create
+
+        def create_concurrently(objs, **kwargs):
+            LessonProgress.objects.create(student=self.student, lesson=self.lessons[2], watched_seconds=15)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(LessonProgress.objects, "bulk_create", side_effect=create_concurrently):
+            flush_watch_progress()
+
+        self.assertEqual(self.watched(self.lessons[2]), 70)
+        self.assertNotIn(WATCH_BUFFER_KEY, self.redis.hashes)
+
+
+class CourseStatsTests(TestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.course = Course.objects.create(
+            title="Django", description="", instructor=self.instructor, status="approved", is_published=True
+        )
+        module = Module.objects.create(course=self.course, title="Basics")
+        self.lessons = [
+            Lesson.objects.create(module=module, title=f"Lesson {index}", content_type="text", duration=100)
+            for index in range(3)
+        ]
+
+    def test_stats_follow_reviews_lessons_and_enrollments(self):
+        for index, rating in enumerate([5, 4]):
+            student = CustomUser.objects.create_user(
+                email=f"student{index}@example.com", username=f"student{index}", password="pass"
+            )
+            CoursePurchase.objects.create(student=student, course=self.course)
+            Review.objects.create(user=student, course=self.course, rating=rating)
+
+        self.lessons[2].is_deleted = True
+        self.lessons[2].save(update_fields=["is_deleted"])
+
+        stats = CourseStats.objects.get(course=self.course)
+        self.assertEqual(
+            (stats.avg_rating, stats.review_count, stats.lesson_count, stats.total_duration, stats.enrolled_count),
+            (4.5, 2, 2, 200, 2)
+        )
+
+        CoursePurchase.objects.filter(course=self.course).first().delete()
+        Review.objects.filter(course=self.course, rating=5).delete()
+
+        stats.refresh_from_db()
+        self.assertEqual((stats.avg_rating, stats.review_count, stats.enrolled_count), (4.0, 1, 1))
+
+    def test_deleting_course_removes_stats(self):
+        self.course.delete()
+        self.assertFalse(CourseStats.objects.exists())
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class CertificateRerenderTests(TestCase):
+    def setUp(self):
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.course = Course.objects.create(title="Django", description="", instructor=instructor)
+        for index in range(5):
+            CourseCertificate.objects.create(
+                student=CustomUser.objects.create_user(
+                    email=f"student{index}@example.com", username=f"student{index}", password="pass"
+                ),
+                course=self.course,
+                certificate_id=f"CERT{index}",
+                issued_at=timezone.now(),
+            )
+
+    def test_rerender_uploads_every_certificate_in_chunks(self):
+        course = self.course
+
+        def upload(certificate, pdf):
+            if certificate.certificate_id == "CERT3":
+                raise RuntimeError("upload failed")
+            self.assertTrue(pdf.startswith(b"%PDF"))
+            return f"https://cdn.example.com/{certificate.certificate_id}.pdf"
+
+        with mock.patch("courses.utils.upload_certificate_pdf", side_effect=upload) as uploader:
+            rerender_certificates_task(course.id, chunk_size=2)
+
+        self.assertEqual(uploader.call_count, 5)
+        files = dict(CourseCertificate.objects.values_list("certificate_id", "certificate_file"))
+        self.assertEqual(files["CERT0"], "https://cdn.example.com/CERT0.pdf")
+        self.assertFalse(files["CERT3"])
+
+    @mock.patch("courses.management.commands.rerender_certificates.rerender_certificates", return_value=(2, 0))
+    def test_sync_command_renders_in_chunks(self, rerender):
+        call_command("rerender_certificates", "--sync", "--chunk-size", "2", stdout=io.StringIO())
+
+        chunks = [call.args[0] for call in rerender.call_args_list]
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(sorted(sum(chunks, [])), sorted(CourseCertificate.objects.values_list("id", flat=True)))
@@ -1,113 +1,113 @@
 import os,io
 import uuid 
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import cloudinary.uploader
 from cloudinary import CloudinaryImage
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.utils import timezone
 from reportlab.pdfgen import canvas
-from django.db import models 
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils.formats import date_format
 from django.utils.timezone import localtime
+from django.utils.functional import cached_property
 
-from .models import Lesson, LessonProgress,CourseCertificate
+from .models import Module, Lesson, LessonProgress,CourseCertificate,CourseProgress,CourseStats,Review
 from payment.models import CoursePurchase
-from quiz.models import Quiz,UserQuizAttempt
+from users.utils import invalidate_student_portfolio
+
+logger = logging.getLogger(__name__)
 
 def generate_certificate_id():
     return str(uuid.uuid4())[:12].upper()
 
-def generate_certificate_file(certificate:CourseCertificate):
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer)
-
-    p.setFont("Helvetica-Bold", 24)
-    p.drawCentredString(300, 750, "Certificate of Completion")
+CERTIFICATE_LAYOUT = (
+    ("Helvetica-Bold", 24, 750, "Certificate of Completion"),
+    ("Helvetica", 14, 700, "This is to certify that"),
+    ("Helvetica-Bold", 16, 675, "{student}"),
+    ("Helvetica", 14, 650, "has successfully completed the course"),
+    ("Helvetica-Bold", 16, 625, "{course}"),
+    ("Helvetica", 12, 580, "Issued on: {issued_on}"),
+    ("Helvetica", 12, 560, "Certificate ID: {certificate_id}"),
+)
 
-    p.setFont("Helvetica", 14)
-    p.drawCentredString(300, 700, f"This is to certify that")
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(300, 675, certificate.student.username)
-    p.setFont("Helvetica", 14)
-    p.drawCentredString(300, 650, f"has successfully completed the course")
-    p.setFont("Helvetica-Bold", 16)
-    p.drawCentredString(300, 625, certificate.course.title)
+def render_certificate_pdf(certificate:CourseCertificate):
+    values = {
+        "student": certificate.student.username,
+        "course": certificate.course.title,
+        "issued_on": date_format(localtime(certificate.issued_at), 'DATE_FORMAT'),
+        "certificate_id": certificate.certificate_id,
+    }
 
-    p.setFont("Helvetica", 12)
-    p.drawCentredString(300, 580, f"Issued on: {date_format(localtime(certificate.issued_at), 'DATE_FORMAT')}")
-    p.drawCentredString(300, 560, f"Certificate ID: {certificate.certificate_id}")
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer)
+    for font, size, y, text in CERTIFICATE_LAYOUT:
+        p.setFont(font, size)
+        p.drawCentredString(300, y, text.format(**values))
 
     p.showPage()
     p.save()
+    return buffer.getvalue()
 
-    buffer.seek(0)
-
+def upload_certificate_pdf(certificate:CourseCertificate, pdf):
     upload = cloudinary.uploader.upload(
-        buffer,
+        pdf,
         resource_type="raw",
         folder="media/certificates",
         public_id=f"{certificate.certificate_id}",
         overwrite=True
     )
+    return upload["secure_url"]
 
-    certificate.certificate_file = upload["secure_url"]
-    certificate.save(update_fields=["certificate_file"])
-
-    buffer.close()
+def generate_certificate_file(certificate:CourseCertificate):
+    certificate.certificate_file = upload_certificate_pdf(certificate, render_certificate_pdf(certificate))
+    certificate.status = "ready"
+    certificate.save(update_fields=["certificate_file", "status"])
     return certificate
 
+def rerender_certificates(certificate_ids, workers):
+    certificates = list(
+        CourseCertificate.objects.filter(id__in=certificate_ids).select_related("student", "course")
+    )
 
-def issue_certificate_if_eligible(student, course):
-    if CourseCertificate.objects.filter(student=student, course=course).exists():
-        return
-    
-    try:
-        purchase = CoursePurchase.objects.get(student=student, course=course)
-    except CoursePurchase.DoesNotExist:
-        return    
+    def render(certificate):
+        try:
+            certificate.certificate_file = upload_certificate_pdf(certificate, render_certificate_pdf(certificate))
+            certificate.status = "ready"
+            return True
+        except Exception as e:
+            logger.error(f"Certificate {certificate.certificate_id} re-render failed: {e}")
+            return False
 
-    total_lessons = Lesson.objects.filter(
-        module__course=course,
-        duration__gt=0,
-        is_active=True,
-        is_deleted=False,
-        created_at__lte=purchase.purchased_at
-    ).count()
+    # Uploads dominate, so a few threads keep the network busy while the next PDF renders.
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rendered = [
+            certificate for certificate, ok in zip(certificates, pool.map(render, certificates)) if ok
+        ]
 
-    completed_lessons = LessonProgress.objects.filter(
-        student=student,
-        lesson__module__course=course,
-        lesson__duration__gt=0,
-        completed=True,
-        lesson__created_at__lte=purchase.purchased_at
-    ).count()
+    CourseCertificate.objects.bulk_update(rendered, ["certificate_file", "status"], batch_size=500)
+    return len(rendered), len(certificates) - len(rendered)
 
-    if total_lessons == 0 or completed_lessons < total_lessons:
-        return
-    
-    if not purchase:
-        return
-    
-    try:
-        quiz = Quiz.objects.get(course=course)
-    except Quiz.DoesNotExist:
-        return
 
-    passed_attempt = UserQuizAttempt.objects.filter(
-        user = student,
-        quiz = quiz,
-        is_passed = True
-    ).exists()
+def issue_certificate(student, course):
+    from .tasks import queue_certificate_generation
 
-    if not passed_attempt:
-        return    
+    certificate, created = CourseCertificate.objects.get_or_create(
+        student=student,
+        course=course,
+        defaults={"issued_at": timezone.now(), "certificate_id": generate_certificate_id()}
+    )
+    if not created:
+        return certificate
 
-    certificate = CourseCertificate.objects.create(student=student, course=course, issued_at=timezone.now(), certificate_id= generate_certificate_id())
+    CoursePurchase.objects.filter(student=student, course=course).update(progress_locked=True)
 
-    purchase.progress_locked = True
-    purchase.save(update_fields=["progress_locked"])
-    
-    return generate_certificate_file(certificate)
+    # Rendering and the Cloudinary upload happen off the request; the row is what grants the certificate.
+    transaction.on_commit(lambda: queue_certificate_generation(certificate.id))
+    return certificate
 
 def verify_certificate(certificate_id: str):
     try:
@@ -130,32 +130,223 @@ def verify_certificate(certificate_id: str):
     except CourseCertificate.DoesNotExist:
         return None   
     
-def get_course_progress(student,course):
-    try:
-        purchase = CoursePurchase.objects.get(student=student,course=course)
-    except CoursePurchase.DoesNotExist:
-        return 0
-    
-    if purchase.progress_locked:
-        return 100
-        
+def rebuild_course_progress(purchases):
     total_lessons = Lesson.objects.filter(
-        module__course=course,
+        module__course=OuterRef("course"),
         duration__gt=0,
         is_active=True,
         is_deleted=False,
-        created_at__lte=purchase.purchased_at
-    ).count()
+        created_at__lte=OuterRef("purchased_at")
+    ).values("module__course").annotate(count=Count("id")).values("count")
 
     completed_lessons = LessonProgress.objects.filter(
-        student=student,
-        lesson__module__course=course,
+        student=OuterRef("student"),
+        lesson__module__course=OuterRef("course"),
         lesson__duration__gt=0,
         completed=True,
-        lesson__created_at__lte=purchase.purchased_at
-    ).count()
+        lesson__created_at__lte=OuterRef("purchased_at")
+    ).values("student").annotate(count=Count("id")).values("count")
+
+    purchases = CoursePurchase.objects.filter(
+        id__in=[purchase.id for purchase in purchases]
+    ).annotate(
+        total=Coalesce(Subquery(total_lessons), Value(0)),
+        completed=Coalesce(Subquery(completed_lessons), Value(0))
+    )
 
-    if total_lessons == 0 :
+    records = []
+    for purchase in purchases:
+        progress = CourseProgress(
+            purchase=purchase,
+            total_lessons=purchase.total,
+            completed_lessons=purchase.completed
+        )
+        progress.refresh_percentage()
+        records.append(progress)
+
+    CourseProgress.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=["purchase"],
+        update_fields=["total_lessons", "completed_lessons", "percentage", "updated_at"]
+    )
+    invalidate_student_portfolio(*{purchase.student_id for purchase in purchases})
+    return {progress.purchase_id: progress for progress in records}
+
+def get_purchase_progress(purchase):
+    try:
+        return purchase.progress
+    except CourseProgress.DoesNotExist:
+        return rebuild_course_progress([purchase])[purchase.id]
+
+def get_course_progress(student,course):
+    try:
+        purchase = CoursePurchase.objects.select_related("progress").get(student=student,course=course)
+    except CoursePurchase.DoesNotExist:
         return 0
     
-    return round((completed_lessons/total_lessons) * 100,2)
+    if purchase.progress_locked:
+        return 100
+
+    return get_purchase_progress(purchase).percentage
+
+def get_course_progress_map(student, purchases):
+    purchases = {purchase.id: purchase for purchase in purchases}
+    if not purchases:
+        return {}
+
+    records = {
+        progress.purchase_id: progress
+        for progress in CourseProgress.objects.filter(purchase_id__in=purchases.keys())
+    }
+
+    missing = [purchase for purchase_id, purchase in purchases.items() if purchase_id not in records]
+    if missing:
+        records.update(rebuild_course_progress(missing))
+
+    progress = {}
+    for purchase_id, purchase in purchases.items():
+        if purchase.progress_locked:
+            progress[purchase.course_id] = 100
+        else:
+            progress[purchase.course_id] = records[purchase_id].percentage
+    return progress
+
+def record_lesson_completion(student, lesson):
+    if not lesson.duration or lesson.duration <= 0:
+        return
+
+    with transaction.atomic():
+        purchase = CoursePurchase.objects.filter(
+            student=student,
+            course_id=lesson.module.course_id
+        ).first()
+
+        if not purchase or lesson.created_at > purchase.purchased_at:
+            return
+
+        progress = CourseProgress.objects.select_for_update().filter(purchase=purchase).first()
+        if progress is None:
+            rebuild_course_progress([purchase])
+            return
+
+        progress.completed_lessons += 1
+        progress.refresh_percentage()
+        progress.save(update_fields=["completed_lessons", "percentage", "updated_at"])
+        invalidate_student_portfolio(student.id)
+
+class ViewerContext:
+    def __init__(self, user):
+        self.user = user if user is not None and user.is_authenticated else None
+        self.role = getattr(self.user, "role", None)
+        self._completed_lessons = {}
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None
+
+    @property
+    def is_privileged(self):
+        return self.user is not None and (self.user.is_staff or self.role in ["admin", "instructor"])
+
+    @cached_property
+    def purchases(self):
+        if not self.user:
+            return {}
+        return {
+            purchase.course_id: purchase
+            for purchase in CoursePurchase.objects.filter(student=self.user)
+        }
+
+    @cached_property
+    def certificates(self):
+        if not self.user:
+            return {}
+        return dict(
+            CourseCertificate.objects.filter(student=self.user).values_list("course_id", "issued_at")
+        )
+
+    def has_purchased(self, course_id):
+        return course_id in self.purchases
+
+    def completed_lesson_ids(self, course_id):
+        if not self.user:
+            return set()
+
+        if course_id not in self._completed_lessons:
+            self._completed_lessons[course_id] = set(
+                LessonProgress.objects.filter(
+                    student=self.user,
+                    lesson__module__course_id=course_id,
+                    completed=True
+                ).values_list("lesson_id", flat=True)
+            )
+        return self._completed_lessons[course_id]
+
+    def get_progress_map(self, course_ids):
+        purchases = [self.purchases[course_id] for course_id in course_ids if course_id in self.purchases]
+        return get_course_progress_map(self.user, purchases)
+
+def get_viewer_context(context):
+    viewer = context.get("viewer")
+    if viewer is None:
+        request = context.get("request")
+        viewer = ViewerContext(request.user if request else None)
+        context["viewer"] = viewer
+    return viewer
+
+def get_course_content_prefetch():
+    lessons = Lesson.objects.filter(is_deleted=False).prefetch_related("resources")
+    modules = Module.objects.filter(is_active=True, is_deleted=False).prefetch_related(
+        Prefetch("lessons", queryset=lessons, to_attr="visible_lessons")
+    )
+    return [
+        Prefetch("modules", queryset=modules, to_attr="visible_modules"),
+        "instructor__profile__links",
+        "final_quiz__questions__options",
+    ]
+
+def refresh_course_stats(course_id, reviews=False, content=False, enrollments=False):
+    with transaction.atomic():
+        CourseStats.objects.get_or_create(course_id=course_id)
+        stats = CourseStats.objects.select_for_update().get(course_id=course_id)
+        fields = ["updated_at"]
+
+        if reviews:
+            result = Review.objects.filter(course_id=course_id).aggregate(count=Count("id"), avg=Avg("rating"))
+            stats.review_count = result["count"]
+            stats.avg_rating = result["avg"]
+            fields += ["review_count", "avg_rating"]
+
+        if content:
+            result = Lesson.objects.filter(
+                module__course_id=course_id,
+                is_deleted=False,
+                module__is_deleted=False
+            ).aggregate(count=Count("id"), duration=Sum("duration"))
+            stats.lesson_count = result["count"]
+            stats.total_duration = result["duration"] or 0
+            fields += ["lesson_count", "total_duration"]
+
+        if enrollments:
+            stats.enrolled_count = CoursePurchase.objects.filter(course_id=course_id).count()
+            fields.append("enrolled_count")
+
+        stats.save(update_fields=fields)
+    return stats
+
+def adjust_enrolled_count(course_id, delta):
+    updated = CourseStats.objects.filter(course_id=course_id).update(
+        enrolled_count=F("enrolled_count") + delta
+    )
+    if not updated:
+        refresh_course_stats(course_id, enrollments=True)
+
+def course_stats_annotations():
+    return {
+        "avg_rating": F("stats__avg_rating"),
+        "review_count": F("stats__review_count"),
+        "total_duration": F("stats__total_duration"),
+        "lesson_count": F("stats__lesson_count"),
+        "enrolled_count": F("stats__enrolled_count"),
+    }
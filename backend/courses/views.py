@@ -16,12 +16,15 @@ import logging
 from .models import (Course,CourseCategory,Module,Lesson,LessonResource,LessonProgress,CourseCertificate,Review)
 from payment.models import CoursePurchase
 from .serializers import (AdminCourseSerializer,InstructorCourseSerializer,CourseCategorySerializer,
-ModuleSerializer,LessonSerializer,LessonResourceSerializer,LessonProgressSerializer,CertificateSerializer,ReviewSerializer)
+ModuleSerializer,LessonSerializer,LessonResourceSerializer,LessonProgressSerializer,CertificateSerializer,ReviewSerializer,
+WatchHeartbeatBatchSerializer)
 from rest_framework.permissions import IsAuthenticated,AllowAny
 from users.permissions import IsInstructorUser,IsAdminUser,IsStudentUser
-from .tasks import send_course_status_email,index_lesson_resource_task
-from .utils import issue_certificate_if_eligible,verify_certificate,get_course_progress,generate_certificate_file
+from .tasks import send_course_status_email,index_lesson_resource_task,is_stale,queue_certificate_generation,requeue_stale_certificate
+from .utils import course_stats_annotations,verify_certificate,get_course_progress
+from .services import ingest_watch_heartbeats
 from instrpanel.utils.youtube_duration import get_youtube_duration
+from pytech.cache import AnonymousResponseCacheMixin,cache_aside,query_cache_key
 import cloudinary
 
 logger = logging.getLogger(__name__)
@@ -38,11 +41,7 @@ class AdminCourseViewSet(viewsets.ReadOnlyModelViewSet):
         return Course.objects.filter(
             is_active=True
             ).exclude(status='draft'
-            ).annotate(
-                avg_rating=Avg("reviews__rating",distinct=True),
-                review_count=Count("reviews",distinct=True),
-                total_duration=Sum("modules__lessons__duration")
-            ).order_by('-created_at')
+            ).annotate(**course_stats_annotations()).order_by('-created_at')
 
     @action(detail=True,methods=['patch'])
     def approve(self,request,pk=None):
@@ -114,11 +113,7 @@ class InstructorCourseViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Course.objects.filter(
             instructor=self.request.user,is_active=True
-            ).annotate(
-                avg_rating=Avg("reviews__rating",distinct=True),
-                review_count=Count("reviews",distinct=True),
-                total_duration=Sum("modules__lessons__duration")
-            ).order_by('-created_at')
+            ).annotate(**course_stats_annotations()).order_by('-created_at')
     
     def destroy(self, request, *args, **kwargs):
         course = self.get_object()
@@ -150,7 +145,7 @@ class InstructorCourseViewSet(viewsets.ModelViewSet):
 
         return Response({"message": "Course submitted for review"})
 
-class CourseCategoryViewSet(viewsets.ModelViewSet):
+class CourseCategoryViewSet(AnonymousResponseCacheMixin,viewsets.ModelViewSet):
     serializer_class=CourseCategorySerializer
     filter_backends=[SearchFilter,OrderingFilter] 
     search_fields = ['name']
@@ -166,6 +161,15 @@ class CourseCategoryViewSet(viewsets.ModelViewSet):
         if self.action in ['list','retrieve']:
             return [AllowAny()]
         return [IsAdminUser()] 
+
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        return self.cached_response(
+            "categories",
+            query_cache_key(request),
+            lambda: build(request, *args, **kwargs),
+            tags=["categories"]
+        )
     
     @action(detail=True,methods=['patch'],permission_classes=[IsAdminUser])
     def toggle_status(self,request,pk=None):
@@ -452,27 +456,22 @@ class LessonProgressViewSet(viewsets.GenericViewSet):
 
         watched_seconds = int(request.data.get("watched_seconds", 0))
 
-        progress, _ = LessonProgress.objects.get_or_create(
-            student=request.user,
-            lesson=lesson
+        results = ingest_watch_heartbeats(
+            request.user,
+            [{"lesson_id": lesson.id, "watched_seconds": watched_seconds}]
         )
+        return Response(results[0])
 
-        if watched_seconds > progress.watched_seconds:
-            progress.watched_seconds = watched_seconds
+    @action(detail=False, methods=["post"], url_path="watch-batch")
+    def watch_batch(self, request):
+        serializer = WatchHeartbeatBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        if lesson.duration > 0:
-            completion_threshold = lesson.duration * 0.9
-            if progress.watched_seconds >= completion_threshold:
-                if not progress.completed:
-                    progress.completed = True
-                    progress.completed_at = timezone.now()
-        progress.save()
-
-        return Response({
-            "lesson_id": lesson.id,
-            "watched_seconds": progress.watched_seconds,
-            "completed": progress.completed
-        })
+        results = ingest_watch_heartbeats(
+            request.user,
+            serializer.validated_data["heartbeats"]
+        )
+        return Response({"results": results})
 
 class CourseProgressViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -509,8 +508,18 @@ class CertificateViewSet(viewsets.ReadOnlyModelViewSet):
     def download(self, request, certificate_id=None):
         certificate = self.get_object()
 
-        if not certificate.certificate_file:
-            return Response({"error": "Certificate file not found"}, status=404)
+        if certificate.status != "ready" or not certificate.certificate_file:
+            if certificate.status == "failed":
+                # Only the request that flips it back to pending queues another render.
+                if CourseCertificate.objects.filter(id=certificate.id, status="failed").update(status="pending"):
+                    queue_certificate_generation(certificate.id)
+                certificate.status = "pending"
+            elif is_stale(certificate):
+                requeue_stale_certificate(certificate.id)
+            return Response(
+                {"status": certificate.status, "detail": "Certificate is being generated"},
+                status=status.HTTP_202_ACCEPTED
+            )
 
         download_url, _ = cloudinary.utils.cloudinary_url(
             certificate.certificate_file.name,
@@ -537,6 +546,17 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        course_id = request.query_params.get("course")
+        build = super().list
+        data = cache_aside(
+            "reviews",
+            query_cache_key(request),
+            lambda: build(request, *args, **kwargs).data,
+            tags=[f"reviews:{course_id}" if course_id else "reviews"]
+        )
+        return Response(data)
+
     def perform_create(self, serializer):
         user = self.request.user
         course = serializer.validated_data["course"]
@@ -1,7 +1,20 @@
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.utils import timezone
-from .models import LiveSession, LiveParticipant
+from django.conf import settings
+import logging
+import redis
+from .models import LiveSession
+from .services import (
+    RateLimiter,
+    get_event_batcher,
+    get_roster,
+    join_participant,
+    leave_participant,
+    set_participant_flag,
+)
+from payment.utils import is_enrolled
+
+logger = logging.getLogger(__name__)
 
 
 class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
@@ -13,15 +26,27 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
         if not self.user or not self.user.is_authenticated:
             return await self.close()
 
-        if not await self.can_join():
+        role = await self.can_join()
+        if role is None:
             return await self.close()
 
-        await self.upsert_participant()
+        participant = {
+            "user_id": self.user.id,
+            "username": self.user.username or self.user.email,
+            "role": role,
+        }
+        try:
+            await join_participant(self.session_id, participant)
+        except redis.RedisError as e:
+            logger.error(f"Live participant state unavailable for session {self.session_id}: {e}")
+            return await self.close()
 
+        self.limiter = RateLimiter({"reactions": settings.LIVE_REACTION_RATE})
+        self.user_group = self.peer_group(self.user.id)
         await self.channel_layer.group_add(self.room_group, self.channel_name)
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
         await self.accept()
 
-        role = await self.get_user_role()
         await self.send_json({
             "type": "joined",
             "role": role,
@@ -34,30 +59,25 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
                 "type": "participant.event",
                 "event": "joined",
                 "user_id": self.user.id,
-                "participant": {
-                    "user_id": self.user.id,
-                    "username": self.user.username or self.user.email,  
-                    "role": role,
-                    "hand_raised": False,
-                    "is_muted": False,
-                },
+                "participant": {**participant, "hand_raised": False, "is_muted": False},
             }
         )
 
     async def disconnect(self, code):
-        if hasattr(self, "room_group"):
-            await self.mark_left()
+        if hasattr(self, "user_group"):
+            await self.handle_leave()
+            await self.channel_layer.group_discard(self.room_group, self.channel_name)
+            await self.channel_layer.group_discard(self.user_group, self.channel_name)
 
-            await self.channel_layer.group_send(
-                self.room_group,
-                {
-                    "type": "participant.event",
-                    "event": "left",
-                    "user_id": self.user.id,
-                }
-            )
+    def peer_group(self, user_id):
+        return f"webrtc_{self.session_id}_{user_id}"
 
-            await self.channel_layer.group_discard(self.room_group, self.channel_name)
+    def signal_group(self, to_user_id):
+        # to_user_id comes from the client; anything that is not a user id falls back to the room.
+        try:
+            return self.peer_group(int(to_user_id))
+        except (TypeError, ValueError):
+            return self.room_group
 
     async def participant_event(self, event):
         msg = {
@@ -79,25 +99,17 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
             "is_muted": event["is_muted"],
         })
 
-    async def participant_hand(self, event):
-        await self.send_json({
-            "type": "hand",
-            "user_id": event["user_id"],
-            "hand_raised": event["hand_raised"],
-        })
-
-    async def participants_update(self, event):
-        await self.send_json({
-            "type": "participants",
-            "participants": event["participants"],
-        })
-
-    async def reaction_event(self, event):
-        await self.send_json({
-            "type": "reaction",
-            "user_id": event["user_id"],
-            "emoji": event["emoji"],
-        })
+    async def live_batch(self, event):
+        if event["reactions"]:
+            await self.send_json({
+                "type": "reactions",
+                "counts": event["reactions"],
+            })
+        if event["hands"]:
+            await self.send_json({
+                "type": "hands",
+                "hands": event["hands"],
+            })
 
     async def session_ended(self, event):
         await self.send_json({
@@ -116,7 +128,7 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
 
         elif t in ("offer", "answer", "ice-candidate"):
             await self.channel_layer.group_send(
-                self.room_group,
+                self.signal_group(content.get("to_user_id")),
                 {
                     "type": "signal.forward",
                     "from_user_id": self.user.id,
@@ -126,8 +138,8 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
             )
 
         elif t == "toggle-mute":
-            muted = content.get("muted", False)
-            await self.update_mute_state(muted)
+            muted = bool(content.get("muted", False))
+            await self.set_flag("muted", muted)
 
             await self.channel_layer.group_send(
                 self.room_group,
@@ -139,29 +151,20 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
             )
 
         elif t == "toggle-hand":
-            raised = content.get("raised", False)
-            await self.update_hand_state(raised)
-
-            await self.channel_layer.group_send(
-                self.room_group,
-                {
-                    "type": "participant.hand",
-                    "user_id": self.user.id,
-                    "hand_raised": raised,
-                }
-            )
+            raised = bool(content.get("raised", False))
+            await self.set_flag("hands", raised)
+            get_event_batcher().add_hand(self.channel_layer, self.room_group, self.user.id, raised)
 
         elif t == "reaction":
             emoji = content.get("emoji")
-            if emoji:
-                await self.channel_layer.group_send(
-                    self.room_group,
-                    {
-                        "type": "reaction.event",
-                        "user_id": self.user.id,
-                        "emoji": emoji,
-                    }
-                )
+            if not isinstance(emoji, str) or not emoji or len(emoji) > 16:
+                return
+
+            batcher = get_event_batcher()
+            if self.limiter.allow("reactions"):
+                batcher.add_reaction(self.channel_layer, self.room_group, emoji)
+            else:
+                batcher.record_dropped("reactions")
 
     async def signal_forward(self, event):
         if event["from_user_id"] == self.user.id:
@@ -169,127 +172,58 @@ class LiveSessionConsumer(AsyncJsonWebsocketConsumer):
 
         await self.send_json({
             "type": event["signal_type"],
+            "from_user_id": event["from_user_id"],
             **event["payload"],
         })
 
+    async def set_flag(self, flag, value):
+        # The broadcast still goes out; only the roster snapshot misses the change.
+        try:
+            await set_participant_flag(self.session_id, flag, self.user.id, value)
+        except redis.RedisError as e:
+            logger.error(f"Live participant state unavailable for session {self.session_id}: {e}")
+
     async def handle_join(self):
-        await self.upsert_participant()
-        participants = await self.get_participants()
+        try:
+            participants = await get_roster(self.session_id)
+        except redis.RedisError as e:
+            logger.error(f"Live participant state unavailable for session {self.session_id}: {e}")
+            return
 
-        await self.channel_layer.group_send(
-            self.room_group,
-            {
-                "type": "participants.update",
-                "participants": participants,
-            },
-        )
+        # Everyone else already got the "joined" diff; only this socket needs the full roster.
+        await self.send_json({
+            "type": "participants",
+            "participants": participants,
+        })
 
     async def handle_leave(self):
-        await self.mark_left()
-        participants = await self.get_participants()
+        try:
+            left = await leave_participant(self.session_id, self.user.id)
+        except redis.RedisError as e:
+            logger.error(f"Live participant state unavailable for session {self.session_id}: {e}")
+            left = True
 
-        await self.channel_layer.group_send(
-            self.room_group,
-            {
-                "type": "participants.update",
-                "participants": participants,
-            },
-        )
+        if left:
+            await self.channel_layer.group_send(
+                self.room_group,
+                {
+                    "type": "participant.event",
+                    "event": "left",
+                    "user_id": self.user.id,
+                }
+            )
 
     @database_sync_to_async
     def can_join(self):
         try:
             s = LiveSession.objects.select_related("course").get(id=self.session_id)
         except LiveSession.DoesNotExist:
-            return False
+            return None
         if s.status != "ongoing":
-            return False
-        c = s.course
-        
-        return (
-            c.instructor_id == self.user.id or
-            c.purchases.filter(student=self.user).exists()
-        )
-
-    @database_sync_to_async
-    def upsert_participant(self):
-        session = LiveSession.objects.select_related("course").get(id=self.session_id)
-        is_instructor = session.course.instructor_id == self.user.id
-        role = "tutor" if is_instructor else "student"
-
-        LiveParticipant.objects.update_or_create(
-            session=session,
-            user=self.user,
-            defaults={
-                "joined_at": timezone.now(),
-                "left_at": None,
-                "role": role,
-            },
-        )
-
-    @database_sync_to_async
-    def get_user_role(self):
-        try:
-            p = LiveParticipant.objects.get(
-                session_id=self.session_id,
-                user_id=self.user.id,
-                left_at__isnull=True,
-            )
-            return p.role or "student"
-        except LiveParticipant.DoesNotExist:
-            return "student"
-
-    @database_sync_to_async
-    def mark_left(self):
-        LiveParticipant.objects.filter(
-            session_id=self.session_id,
-            user_id=self.user.id,
-            left_at__isnull=True
-        ).update(left_at=timezone.now())
-
-    @database_sync_to_async
-    def get_participants(self):
-        rows = (
-            LiveParticipant.objects.filter(
-                session_id=self.session_id,
-                left_at__isnull=True,
-            )
-            .select_related("user")
-            .values(
-                "user__id",
-                "user__username",
-                "role",
-                "hand_raised",
-                "is_muted",
-            )
-        )
-
-        return [
-            {
-                "user_id": row["user__id"],
-                "username": row["user__username"],
-                "role": row["role"],
-                "hand_raised": row["hand_raised"],
-                "is_muted": row["is_muted"],
-            }
-            for row in rows
-        ]
-
-    @database_sync_to_async
-    def update_mute_state(self, muted):
-        LiveParticipant.objects.filter(
-            session_id=self.session_id,
-            user_id=self.user.id,
-            left_at__isnull=True
-        ).update(is_muted=muted)
-
-    @database_sync_to_async
-    def update_hand_state(self, raised):
-        LiveParticipant.objects.filter(
-            session_id=self.session_id,
-            user_id=self.user.id,
-            left_at__isnull=True
-        ).update(hand_raised=raised)
+            return None
+        if s.course.instructor_id == self.user.id:
+            return "tutor"
+        return "student" if is_enrolled(s.course_id, self.user.id) else None
 
 class NotifyConsumer(AsyncJsonWebsocketConsumer):
     async def connect(self):
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import time
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+
+from livesession.models import LiveSession
+from users.models import CustomUser
+from users.serializers import CustomTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive N fake peers through a live session in-process: every student sends ICE candidates to the "
+        "instructor, and the command reports how many frames the channel layer delivered per signal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("session", help="Id of an ongoing live session.")
+        parser.add_argument("--peers", type=int, default=50, help="Number of enrolled students to connect.")
+        parser.add_argument("--candidates", type=int, default=10, help="ICE candidates sent by each peer.")
+        parser.add_argument("--broadcast", action="store_true", help="Omit to_user_id to measure the old fan-out.")
+        parser.add_argument("--timeout", type=float, default=30)
+
+    def handle(self, *args, **options):
+        try:
+            session = LiveSession.objects.select_related("course__instructor").get(id=options["session"])
+        except LiveSession.DoesNotExist:
+            raise CommandError(f"Live session {options['session']} does not exist")
+
+        if session.status != "ongoing":
+            raise CommandError("The live session must be ongoing")
+
+        instructor = session.course.instructor
+        students = list(
+            CustomUser.objects.filter(purchases__course=session.course).order_by("id")[:options["peers"]]
+        )
+        if not students:
+            raise CommandError("The session's course has no enrolled students")
+
+        tokens = {
+            user.id: str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+            for user in [instructor, *students]
+        }
+
+        result = async_to_sync(self.run)(
+            f"/ws/live/{session.id}/",
+            tokens,
+            instructor.id,
+            options["candidates"],
+            options["broadcast"],
+            options["timeout"],
+        )
+
+        sent, delivered, elapsed = result
+        self.stdout.write(f"peers: {len(students)}  signals sent: {sent}  frames delivered: {delivered}")
+        self.stdout.write(
+            f"frames per signal: {delivered / sent:.1f}  elapsed: {elapsed:.2f}s  "
+            f"throughput: {sent / elapsed:.1f} signals/s"
+        )
+
+    async def drain(self, communicator):
+        received = 0
+        while not await communicator.receive_nothing(timeout=0.05):
+            await communicator.receive_from()
+            received += 1
+        return received
+
+    async def run(self, path, tokens, instructor_id, candidates, broadcast, timeout):
+        from pytech.asgi import application
+
+        peers = {}
+        for user_id, token in tokens.items():
+            communicator = WebsocketCommunicator(application, f"{path}?token={token}")
+            connected, _ = await communicator.connect(timeout=timeout)
+            if not connected:
+                raise CommandError(f"User {user_id} could not join the session")
+            peers[user_id] = communicator
+
+        # Join announcements are not part of the measurement.
+        await asyncio.gather(*(self.drain(communicator) for communicator in peers.values()))
+
+        frame = {"type": "ice-candidate", "candidate": {"candidate": "candidate:0 1 UDP 1 127.0.0.1 9 typ host"}}
+        if not broadcast:
+            frame["to_user_id"] = instructor_id
+        text = json.dumps(frame)
+
+        started = time.perf_counter()
+        sent = 0
+        for user_id, communicator in peers.items():
+            if user_id == instructor_id:
+                continue
+            for _ in range(candidates):
+                await communicator.send_to(text_data=text)
+                sent += 1
+
+        instructor = peers[instructor_id]
+        for _ in range(sent):
+            await instructor.receive_from(timeout=timeout)
+        elapsed = time.perf_counter() - started
+
+        others = await asyncio.gather(*(self.drain(communicator) for communicator in peers.values()))
+        delivered = sent + sum(others)
+
+        await asyncio.gather(*(communicator.disconnect() for communicator in peers.values()))
+        return sent, delivered, elapsed
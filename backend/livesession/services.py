@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+import redis
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pytech.redis_client import get_async_redis, get_redis
+from .models import LiveParticipant
+
+logger = logging.getLogger(__name__)
+
+PARTICIPANT_STATE_TTL = 60 * 60 * 24
+LIVE_EVENT_STATS_KEY = "live:event_stats"
+
+_batchers = weakref.WeakKeyDictionary()
+
+
+def participant_state_keys(session_id):
+    prefix = f"live:{session_id}"
+    return {
+        "roster": f"{prefix}:roster",
+        "muted": f"{prefix}:muted",
+        "hands": f"{prefix}:hands",
+        "joined": f"{prefix}:joined",
+        "left": f"{prefix}:left",
+    }
+
+async def join_participant(session_id, participant):
+    keys = participant_state_keys(session_id)
+    user_id = participant["user_id"]
+
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(keys["roster"], user_id, json.dumps(participant))
+        pipe.hset(keys["joined"], user_id, json.dumps({
+            "role": participant["role"],
+            "joined_at": timezone.now().isoformat(),
+        }))
+        pipe.hdel(keys["left"], user_id)
+        pipe.srem(keys["muted"], user_id)
+        pipe.srem(keys["hands"], user_id)
+        for key in keys.values():
+            pipe.expire(key, PARTICIPANT_STATE_TTL)
+        await pipe.execute()
+
+async def leave_participant(session_id, user_id):
+    keys = participant_state_keys(session_id)
+
+    async with get_async_redis().pipeline(transaction=True) as pipe:
+        pipe.hdel(keys["roster"], user_id)
+        pipe.hset(keys["left"], user_id, timezone.now().isoformat())
+        pipe.srem(keys["muted"], user_id)
+        pipe.srem(keys["hands"], user_id)
+        pipe.expire(keys["left"], PARTICIPANT_STATE_TTL)
+        removed, *_ = await pipe.execute()
+    return bool(removed)
+
+async def set_participant_flag(session_id, flag, user_id, value):
+    key = participant_state_keys(session_id)[flag]
+    client = get_async_redis()
+    if value:
+        await client.sadd(key, user_id)
+    else:
+        await client.srem(key, user_id)
+
+async def get_roster(session_id):
+    keys = participant_state_keys(session_id)
+
+    async with get_async_redis().pipeline(transaction=False) as pipe:
+        pipe.hvals(keys["roster"])
+        pipe.smembers(keys["muted"])
+        pipe.smembers(keys["hands"])
+        entries, muted, hands = await pipe.execute()
+
+    participants = []
+    for entry in entries:
+        participant = json.loads(entry)
+        user_id = str(participant["user_id"])
+        participant["is_muted"] = user_id in muted
+        participant["hand_raised"] = user_id in hands
+        participants.append(participant)
+    return participants
+
+def email_progress_key(session_id, kind):
+    return f"live:{session_id}:emails:{kind}"
+
+def start_email_progress(session_id, kind, total):
+    key = email_progress_key(session_id, kind)
+    try:
+        with get_redis().pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"total": total, "sent": 0, "failed": 0})
+            pipe.expire(key, PARTICIPANT_STATE_TTL)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Could not record email progress for session {session_id}: {e}")
+
+def record_email_progress(session_id, kind, sent=0, failed=0):
+    key = email_progress_key(session_id, kind)
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hincrby(key, "sent", sent)
+            pipe.hincrby(key, "failed", failed)
+            pipe.hget(key, "total")
+            sent, failed, total = pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Could not record email progress for session {session_id}: {e}")
+        return
+
+    # Progress is recorded per message; only log at info once every recipient is accounted for.
+    done = total is not None and sent + failed >= int(total)
+    logger.log(
+        logging.INFO if done else logging.DEBUG,
+        f"Live session email progress | SessionID={session_id} | Kind={kind} | Sent={sent}/{total} | Failed={failed}"
+    )
+
+def persist_attendance(session_id, close_open=False):
+    keys = participant_state_keys(session_id)
+
+    with get_redis().pipeline(transaction=True) as pipe:
+        pipe.hgetall(keys["joined"])
+        pipe.hgetall(keys["left"])
+        pipe.smembers(keys["muted"])
+        pipe.smembers(keys["hands"])
+        joined, left, muted, hands = pipe.execute()
+
+    count = write_attendance(session_id, joined, left, muted, hands, close_open) if joined else 0
+
+    # Only drop the Redis state once the attendance it holds is committed.
+    if close_open:
+        transaction.on_commit(lambda: get_redis().delete(*keys.values()), robust=True)
+    return count
+
+def write_attendance(session_id, joined, left, muted, hands, close_open):
+    now = timezone.now()
+    existing = {
+        participant.user_id: participant
+        for participant in LiveParticipant.objects.filter(session_id=session_id, user_id__in=joined.keys())
+    }
+
+    to_update = []
+    to_create = []
+    for user_id, raw in joined.items():
+        entry = json.loads(raw)
+        left_at = parse_datetime(left[user_id]) if user_id in left else (now if close_open else None)
+        values = {
+            "role": entry["role"],
+            "joined_at": parse_datetime(entry["joined_at"]),
+            "left_at": left_at,
+            "is_muted": user_id in muted,
+            "hand_raised": user_id in hands,
+        }
+
+        participant = existing.get(int(user_id))
+        if participant is None:
+            to_create.append(LiveParticipant(session_id=session_id, user_id=int(user_id), **values))
+        elif any(getattr(participant, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(participant, field, value)
+            to_update.append(participant)
+
+    with transaction.atomic():
+        LiveParticipant.objects.bulk_update(to_update, ["role", "joined_at", "left_at", "is_muted", "hand_raised"], batch_size=500)
+        LiveParticipant.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+
+    logger.info(
+        f"Persisted live attendance | SessionID={session_id} | "
+        f"Created={len(to_create)} | Updated={len(to_update)}"
+    )
+    return len(to_create) + len(to_update)
+
+
+class RateLimiter:
+    # Token bucket per event kind; rates are events per second, which is also the burst size.
+    def __init__(self, rates):
+        self.rates = rates
+        self.buckets = {}
+
+    def allow(self, kind):
+        rate = self.rates[kind]
+        now = time.monotonic()
+        tokens, last = self.buckets.get(kind, (rate, now))
+        tokens = min(rate, tokens + (now - last) * rate)
+
+        allowed = tokens >= 1
+        self.buckets[kind] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+
+class LiveEventBatcher:
+    # One group_send per room group per window instead of one per reaction or hand toggle.
+    def __init__(self, window):
+        self.window = window
+        self.pending = {}
+        self.stats = Counter()
+        # The loop only keeps weak references to tasks.
+        self.tasks = set()
+
+    def add_reaction(self, channel_layer, group, emoji):
+        self._pending(channel_layer, group)["reactions"][emoji] += 1
+        self.stats["reactions_received"] += 1
+
+    def add_hand(self, channel_layer, group, user_id, raised):
+        hands = self._pending(channel_layer, group)["hands"]
+        if user_id in hands:
+            self.stats["hands_coalesced"] += 1
+        hands[user_id] = raised
+        self.stats["hands_received"] += 1
+
+    def record_dropped(self, kind):
+        self.stats[f"{kind}_dropped"] += 1
+
+    def _pending(self, channel_layer, group):
+        batch = self.pending.get(group)
+        if batch is None:
+            batch = self.pending[group] = {"reactions": Counter(), "hands": {}}
+            task = asyncio.create_task(self.flush_later(channel_layer, group))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return batch
+
+    async def flush_later(self, channel_layer, group):
+        await asyncio.sleep(self.window)
+        batch = self.pending.pop(group)
+
+        reactions = dict(batch["reactions"])
+        if reactions:
+            self.stats["reactions_coalesced"] += sum(reactions.values()) - len(reactions)
+        self.stats["batches"] += 1
+
+        try:
+            await channel_layer.group_send(group, {
+                "type": "live.batch",
+                "reactions": reactions,
+                "hands": [
+                    {"user_id": user_id, "hand_raised": raised}
+                    for user_id, raised in batch["hands"].items()
+                ],
+            })
+        except Exception as e:
+            self.stats["batches_dropped"] += 1
+            logger.error(f"Could not send live event batch to {group}: {e}")
+        await self.flush_stats()
+
+    async def flush_stats(self):
+        stats, self.stats = self.stats, Counter()
+        try:
+            async with get_async_redis().pipeline(transaction=False) as pipe:
+                for field, count in stats.items():
+                    pipe.hincrby(LIVE_EVENT_STATS_KEY, field, count)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.debug(f"Could not record live event stats: {e}")
+
+
+def get_event_batcher():
+    # Batches are flushed by a task on the loop that queued them.
+    loop = asyncio.get_running_loop()
+    batcher = _batchers.get(loop)
+    if batcher is None:
+        batcher = _batchers[loop] = LiveEventBatcher(settings.LIVE_EVENT_BATCH_MS / 1000)
+    return batcher
+
+def get_live_event_stats():
+    return {field: int(count) for field, count in get_redis().hgetall(LIVE_EVENT_STATS_KEY).items()}
@@ -1,92 +1,30 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import LiveSession
-from payment.models import CoursePurchase
-from .tasks import send_live_created_email,send_live_started_email,send_live_cancelled_email
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .tasks import notify_live_session_task
+from pytech.cache import invalidate_tags
 
 
 @receiver(post_save, sender=LiveSession)
-def live_session_created(sender, instance, created, **kwargs):
-    if not created:
-        return
-
-    student_ids = CoursePurchase.objects.filter(
-        course=instance.course
-    ).values_list("student_id", flat=True)
-
-    send_live_created_email.delay(
-        session_id=str(instance.id),
-        student_ids=list(student_ids)
-    )
-
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"course_{instance.course.id}",
-        {
-            "type": "notify.message",
-            "data": {
-                "event": "live_created",
-                "session_id": str(instance.id),
-                "course_id": instance.course.id,
-                "title": instance.title,
-                "scheduled_at": instance.scheduled_at.isoformat(),
-            }
-        }
-    )
-
-@receiver(post_save, sender=LiveSession)
-def live_session_status_changed(sender, instance, created, **kwargs):
+def live_session_changed(sender, instance, created, update_fields=None, **kwargs):
     if created:
+        kind = "created"
+    elif update_fields is not None and "status" not in update_fields:
+        return
+    elif instance.status == "ongoing":
+        kind = "started"
+    elif instance.status == "cancelled":
+        kind = "cancelled"
+    else:
         return
 
-    if instance.status == "ongoing":
-        student_ids = CoursePurchase.objects.filter(
-            course=instance.course
-        ).values_list("student_id", flat=True)
-
-        send_live_started_email.delay(
-            session_id=str(instance.id),
-            student_ids=list(student_ids)
-        )
-
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"course_{instance.course.id}",
-            {
-                "type": "notify.message",
-                "data": {
-                    "event": "live_started",
-                    "session_id": str(instance.id),
-                    "course_id": instance.course.id,
-                    "title": instance.title,
-                }
-            }
-        )
-
-    if instance.status == "cancelled":
-        student_ids = CoursePurchase.objects.filter(
-            course=instance.course
-        ).values_list("student_id", flat=True)
-
-        send_live_cancelled_email.delay(
-            session_id=str(instance.id),
-            student_ids=list(student_ids)
-        )
-
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"course_{instance.course.id}",
-            {
-                "type": "notify.message",
-                "data": {
-                    "event": "live_cancelled",
-                    "session_id": str(instance.id),
-                    "course_id": instance.course.id,
-                    "title": instance.title,
-                }
-            }
-        )
-    
+    # Students are looked up by the task itself so the request only enqueues an id.
+    session_id = str(instance.id)
+    transaction.on_commit(lambda: notify_live_session_task.delay(session_id, kind))
 
+# The anonymous course detail response embeds the next scheduled or ongoing session.
+@receiver(post_save, sender=LiveSession)
+@receiver(post_delete, sender=LiveSession)
+def live_session_cache_changed(sender, instance, **kwargs):
+    invalidate_tags(f"course:{instance.course_id}")
@@ -1,81 +1,144 @@
-from celery import shared_task
-from django.utils import timezone
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from celery import group, shared_task
+import logging
+import redis
+from smtplib import SMTPException
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
 from .models import LiveSession
+from payment.models import CoursePurchase
+from .services import persist_attendance, record_email_progress, start_email_progress
+from pytech.utils import iter_chunks
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-@shared_task
-def send_live_created_email(session_id, student_ids):
-    try:
-        session = LiveSession.objects.select_related("course").get(id=session_id)
-    except LiveSession.DoesNotExist:
+LIVE_EMAIL_FROM = "noreply@pytech.com"
+LIVE_EMAILS = {
+    "created": (
+        "📢 New Live Session: {title}",
+        "Hi {username},\n\n"
+        "A new live session has been scheduled.\n\n"
+        "📅 {scheduled_at}\n"
+        "🎓 Course: {course}\n\n"
+        "Login to join when it starts.",
+    ),
+    "started": (
+        "🚀 Live Session Started: {title}",
+        "Hi {username},\n\n"
+        "The live session has started now.\n\n"
+        "🎓 Course: {course}\n"
+        "📢 Join immediately to attend.\n\n"
+        "See you there!",
+    ),
+    "cancelled": (
+        "❌ Live Session Cancelled: {title}",
+        "Hi {username},\n\n"
+        "Unfortunately, the live session has been cancelled.\n\n"
+        "🎓 Course: {course}\n"
+        "We’ll notify you if it is rescheduled.",
+    ),
+}
+
+def live_email_recipients(course_id):
+    # Students without an email are skipped here so the progress total matches what is sent.
+    return CoursePurchase.objects.filter(course_id=course_id).exclude(student__email="")
+
+def dispatch_live_email(session, kind):
+    session_id = str(session.id)
+    recipients = live_email_recipients(session.course_id)
+    total = recipients.count()
+    if not total:
         return
 
-    students = User.objects.filter(id__in=student_ids)
+    start_email_progress(session_id, kind, total)
+    student_ids = recipients.order_by().values_list("student_id", flat=True)
+    group(
+        send_live_email_chunk.s(session_id, kind, chunk)
+        for chunk in iter_chunks(student_ids, settings.LIVE_EMAIL_CHUNK_SIZE)
+    ).apply_async()
 
-    for student in students:
-        send_mail(
-            subject=f"📢 New Live Session: {session.title}",
-            message=(
-                f"Hi {student.username},\n\n"
-                f"A new live session has been scheduled.\n\n"
-                f"📅 {session.scheduled_at}\n"
-                f"🎓 Course: {session.course.title}\n\n"
-                f"Login to join when it starts."
-            ),
-            from_email="noreply@pytech.com",
-            recipient_list=[student.email],
-            fail_silently=True,
-        )
+    logger.info(
+        f"Live session email queued | SessionID={session_id} | Kind={kind} | Recipients={total}"
+    )
 
 @shared_task
-def send_live_started_email(session_id, student_ids):
+def notify_live_session_task(session_id, kind):
     try:
         session = LiveSession.objects.select_related("course").get(id=session_id)
     except LiveSession.DoesNotExist:
         return
 
-    students = User.objects.filter(id__in=student_ids)
-
-    for student in students:
-        send_mail(
-            subject=f"🚀 Live Session Started: {session.title}",
-            message=(
-                f"Hi {student.username},\n\n"
-                f"The live session has started now.\n\n"
-                f"🎓 Course: {session.course.title}\n"
-                f"📢 Join immediately to attend.\n\n"
-                f"See you there!"
-            ),
-            from_email="noreply@pytech.com",
-            recipient_list=[student.email],
-            fail_silently=True,
-        )
+    dispatch_live_email(session, kind)
 
-@shared_task
-def send_live_cancelled_email(session_id, student_ids):
+@shared_task(bind=True, max_retries=5)
+def send_live_email_chunk(self, session_id, kind, student_ids):
     try:
         session = LiveSession.objects.select_related("course").get(id=session_id)
     except LiveSession.DoesNotExist:
         return
 
-    students = User.objects.filter(id__in=student_ids)
+    subject, body = LIVE_EMAILS[kind]
+    context = {
+        "title": session.title,
+        "course": session.course.title,
+        "scheduled_at": session.scheduled_at,
+    }
+    messages = [
+        (student_id, EmailMessage(
+            subject=subject.format(**context),
+            body=body.format(username=username, **context),
+            from_email=LIVE_EMAIL_FROM,
+            to=[email],
+        ))
+        for student_id, username, email in (
+            User.objects.filter(id__in=student_ids).exclude(email="").values_list("id", "username", "email")
+        )
+    ]
+
+    # One SMTP connection for the whole chunk, one send per message so a failure
+    # only retries the recipients that were not delivered.
+    undelivered = []
+    error = None
+    connection = get_connection()
+    try:
+        connection.open()
+    except (SMTPException, OSError) as e:
+        undelivered, error = [student_id for student_id, _ in messages], e
+    else:
+        try:
+            for student_id, message in messages:
+                try:
+                    connection.send_messages([message])
+                except (SMTPException, OSError) as e:
+                    undelivered.append(student_id)
+                    error = e
+                else:
+                    record_email_progress(session_id, kind, sent=1)
+        finally:
+            connection.close()
+
+    if not undelivered:
+        return
 
-    for student in students:
-        send_mail(
-            subject=f"❌ Live Session Cancelled: {session.title}",
-            message=(
-                f"Hi {student.username},\n\n"
-                f"Unfortunately, the live session has been cancelled.\n\n"
-                f"🎓 Course: {session.course.title}\n"
-                f"We’ll notify you if it is rescheduled."
-            ),
-            from_email="noreply@pytech.com",
-            recipient_list=[student.email],
-            fail_silently=True,
+    if self.request.retries >= self.max_retries:
+        record_email_progress(session_id, kind, failed=len(undelivered))
+        logger.error(
+            f"Live session email chunk failed | SessionID={session_id} | Kind={kind} | "
+            f"Undelivered={len(undelivered)} | Error={error}"
         )
+        raise error
+    raise self.retry(
+        args=(session_id, kind, undelivered),
+        exc=error,
+        countdown=settings.LIVE_EMAIL_RETRY_DELAY * 2 ** self.request.retries,
+    )
+
+@shared_task
+def persist_live_attendance_task():
+    for session_id in LiveSession.objects.filter(status="ongoing").values_list("id", flat=True):
+        try:
+            persist_attendance(session_id)
+        except redis.RedisError as e:
+            logger.warning(f"Live attendance persist skipped for session {session_id}: {e}")
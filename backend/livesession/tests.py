@@ -1,3 +1,274 @@
-from django.test import TestCase
+import asyncio
+import json
+import redis
+from smtplib import SMTPRecipientsRefused
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core import mail
+from django.core.mail import get_connection
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
-# Create your tests here.
+from courses.models import Course
+from payment.models import CoursePurchase
+from users.models import CustomUser
+from users.serializers import CustomTokenObtainPairSerializer
+from .models import LiveParticipant, LiveSession
+from .services import LiveEventBatcher, RateLimiter, participant_state_keys, persist_attendance
+from .tasks import send_live_email_chunk
+
+
+class LiveEventBatcherTests(SimpleTestCase):
+    def test_reactions_and_hands_are_coalesced_per_window(self):
+        async def burst():
+            layer = get_channel_layer()
+            channel = await layer.new_channel()
+            await layer.group_add("webrtc_test", channel)
+
+            batcher = LiveEventBatcher(window=0.05)
+            for emoji in ["👍"] * 40 + ["🔥"] * 10:
+                batcher.add_reaction(layer, "webrtc_test", emoji)
+            batcher.add_hand(layer, "webrtc_test", 7, True)
+            batcher.add_hand(layer, "webrtc_test", 7, False)
+
+            message = await asyncio.wait_for(layer.receive(channel), timeout=1)
+            return message, batcher
+
+        message, batcher = async_to_sync(burst)()
+
+        self.assertEqual(message["type"], "live.batch")
+        self.assertEqual(message["reactions"], {"👍": 40, "🔥": 10})
+        self.assertEqual(message["hands"], [{"user_id": 7, "hand_raised": False}])
+        self.assertEqual(batcher.pending, {})
+
+    def test_failed_send_is_counted_and_the_flush_task_released(self):
+        async def burst():
+            layer = mock.AsyncMock()
+            layer.group_send.side_effect = ChannelFull()
+            batcher = LiveEventBatcher(window=0.01)
+            batcher.flush_stats = mock.AsyncMock()
+
+            batcher.add_reaction(layer, "webrtc_test", "👍")
+            self.assertEqual(len(batcher.tasks), 1)
+            await asyncio.gather(*batcher.tasks)
+            await asyncio.sleep(0)
+            return batcher
+
+        batcher = async_to_sync(burst)()
+
+        self.assertEqual(batcher.stats["batches_dropped"], 1)
+        self.assertEqual((batcher.tasks, batcher.pending), (set(), {}))
+
+    def test_rate_limiter_drops_bursts_beyond_rate(self):
+        limiter = RateLimiter({"reactions": 3})
+        self.assertEqual([limiter.allow("reactions") for _ in range(5)], [True, True, True, False, False])
+
+
+@override_settings(LIVE_EMAIL_CHUNK_SIZE=2, CELERY_TASK_ALWAYS_EAGER=True)
+class LiveSessionEmailTests(TestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.course = Course.objects.create(title="Django", description="", instructor=self.instructor)
+        self.students = []
+        for index in range(5):
+            student = CustomUser.objects.create_user(
+                email=f"student{index}@example.com", username=f"student{index}", password="pass"
+            )
+            CoursePurchase.objects.create(student=student, course=self.course)
+            self.students.append(student)
+
+    def test_created_email_is_sent_to_every_student_in_chunks(self):
+        with mock.patch("livesession.tasks.get_connection", wraps=get_connection) as connection:
+            with self.captureOnCommitCallbacks(execute=True):
+                session = LiveSession.objects.create(course=self.course, title="Kickoff", created_by=self.instructor)
+                self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(connection.call_count, 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f"student{index}@example.com" for index in range(5)]
+        )
+        self.assertIn("Hi student0", next(m for m in mail.outbox if m.to == ["student0@example.com"]).body)
+
+        mail.outbox = []
+        with self.captureOnCommitCallbacks(execute=True):
+            session.title = "Kickoff (renamed)"
+            session.save(update_fields=["title"])
+        self.assertEqual(mail.outbox, [])
+
+    @mock.patch("livesession.tasks.start_email_progress")
+    def test_progress_total_skips_students_without_email(self, start_email_progress):
+        CustomUser.objects.filter(id=self.students[0].id).update(email="")
+        with mock.patch("livesession.tasks.send_live_email_chunk.s") as chunk:
+            with self.captureOnCommitCallbacks(execute=True):
+                session = LiveSession.objects.create(course=self.course, title="Kickoff", created_by=self.instructor)
+
+        start_email_progress.assert_called_once_with(str(session.id), "created", 4)
+        queued = [student_id for call in chunk.call_args_list for student_id in call.args[2]]
+        self.assertEqual(sorted(queued), [student.id for student in self.students[1:]])
+
+    def test_retry_resends_only_undelivered_recipients(self):
+        session = LiveSession.objects.create(course=self.course, title="Kickoff", created_by=self.instructor)
+        outbox = get_connection()
+        attempts = []
+
+        def send_messages(messages):
+            recipient = messages[0].to[0]
+            attempts.append(recipient)
+            if recipient == "student1@example.com" and attempts.count(recipient) == 1:
+                raise SMTPRecipientsRefused({recipient: (450, b"try again")})
+            return outbox.send_messages(messages)
+
+        with mock.patch("livesession.tasks.get_connection") as connection:
+            connection.return_value.send_messages.side_effect = send_messages
+            send_live_email_chunk.delay(str(session.id), "started", [student.id for student in self.students[:3]])
+
+        self.assertEqual(sorted(attempts), sorted([student.email for student in self.students[:3]] + ["student1@example.com"]))
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [student.email for student in self.students[:3]]
+        )
+
+
+async def drain(communicator):
+    frames = []
+    while not await communicator.receive_nothing(timeout=0.1):
+        frames.append(await communicator.receive_json_from())
+    return frames
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+@mock.patch("livesession.consumers.leave_participant", new=mock.AsyncMock(return_value=True))
+@mock.patch("livesession.consumers.join_participant", new=mock.AsyncMock())
+class LiveSessionConsumerTests(TestCase):
+    def setUp(self):
+        self.instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        course = Course.objects.create(title="Django", description="", instructor=self.instructor)
+        self.students = []
+        for index in range(2):
+            student = CustomUser.objects.create_user(
+                email=f"student{index}@example.com", username=f"student{index}", password="pass"
+            )
+            CoursePurchase.objects.create(student=student, course=course)
+            self.students.append(student)
+        self.session = LiveSession.objects.create(
+            course=course, title="Kickoff", created_by=self.instructor, status="ongoing"
+        )
+
+    def run_peers(self, scenario):
+        # Connects the instructor and both students, then hands the sockets to the scenario.
+        tokens = [
+            str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+            for user in [self.instructor, *self.students]
+        ]
+
+        async def run():
+            from pytech.asgi import application
+
+            peers = []
+            for token in tokens:
+                communicator = WebsocketCommunicator(application, f"/ws/live/{self.session.id}/?token={token}")
+                connected, _ = await communicator.connect()
+                self.assertTrue(connected)
+                peers.append(communicator)
+            for communicator in peers:
+                await drain(communicator)
+
+            try:
+                return await scenario(*peers)
+            finally:
+                for communicator in peers:
+                    await communicator.disconnect()
+
+        return async_to_sync(run)()
+
+    def exchange(self, to_user_id):
+        async def scenario(instructor, sender, bystander):
+            await sender.send_json_to({"type": "offer", "to_user_id": to_user_id, "sdp": "v=0"})
+            received = [await drain(instructor), await drain(bystander)]
+
+            await sender.send_json_to({"type": "ice-candidate", "to_user_id": self.instructor.id})
+            received.append(await drain(instructor))
+            return received
+
+        return self.run_peers(scenario)
+
+    def test_signal_is_delivered_to_the_addressed_peer_only(self):
+        instructor, bystander, _ = self.exchange(self.instructor.id)
+
+        self.assertEqual(
+            instructor,
+            [{"type": "offer", "from_user_id": self.students[0].id, "to_user_id": self.instructor.id, "sdp": "v=0"}]
+        )
+        self.assertEqual(bystander, [])
+
+    def test_invalid_target_falls_back_to_the_room_without_dropping_the_socket(self):
+        instructor, bystander, after = self.exchange("1; drop")
+
+        self.assertEqual([frame["sdp"] for frame in instructor], ["v=0"])
+        self.assertEqual([frame["sdp"] for frame in bystander], ["v=0"])
+        self.assertEqual([frame["type"] for frame in after], ["ice-candidate"])
+
+    @mock.patch("livesession.consumers.get_roster", side_effect=redis.ConnectionError("down"))
+    @mock.patch("livesession.consumers.set_participant_flag", side_effect=redis.ConnectionError("down"))
+    def test_redis_errors_do_not_drop_the_socket(self, set_participant_flag, get_roster):
+        async def scenario(instructor, student, _):
+            await student.send_json_to({"type": "join"})
+            await student.send_json_to({"type": "toggle-mute", "muted": True})
+            return await drain(instructor), await drain(student)
+
+        instructor, student = self.run_peers(scenario)
+
+        muted = {"type": "mute", "user_id": self.students[0].id, "is_muted": True}
+        self.assertEqual((instructor, student), ([muted], [muted]))
+
+
+class LiveAttendanceTests(TestCase):
+    def setUp(self):
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        course = Course.objects.create(title="Django", description="", instructor=instructor)
+        self.student = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+        self.session = LiveSession.objects.create(
+            course=course, title="Kickoff", created_by=instructor, status="ended"
+        )
+
+    def persist(self, redis_client):
+        pipe = redis_client.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [
+            {str(self.student.id): json.dumps({"role": "student", "joined_at": timezone.now().isoformat()})},
+            {},
+            set(),
+            {str(self.student.id)},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            return persist_attendance(self.session.id, close_open=True)
+
+    @mock.patch("livesession.services.get_redis")
+    def test_session_end_writes_attendance_then_clears_redis_state(self, get_redis):
+        self.assertEqual(self.persist(get_redis.return_value), 1)
+
+        participant = LiveParticipant.objects.get(session=self.session, user=self.student)
+        self.assertIsNotNone(participant.left_at)
+        self.assertTrue(participant.hand_raised)
+        get_redis.return_value.delete.assert_called_once_with(*participant_state_keys(self.session.id).values())
+
+    @mock.patch("livesession.services.get_redis")
+    def test_failed_write_keeps_redis_state(self, get_redis):
+        with mock.patch.object(LiveParticipant.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.persist(get_redis.return_value)
+
+        get_redis.return_value.delete.assert_not_called()
+        get_redis.return_value.pipeline.return_value.__enter__.return_value.delete.assert_not_called()
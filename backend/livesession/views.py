@@ -12,8 +12,10 @@ from .permissions import IsEnrolledOrInstructor
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from courses.models import Course
+from .services import persist_attendance
 from .utils import notify_course_students
 import logging
+import redis
 
 logger = logging.getLogger(__name__)
 
@@ -165,6 +167,14 @@ def end_session(request, id):
     session.ended_at = timezone.now()
     session.save(update_fields=["status", "ended_at"])
 
+    try:
+        persist_attendance(session.id, close_open=True)
+    except redis.RedisError as e:
+        logger.error(
+            f"Live attendance persist failed during session end | "
+            f"SessionID={session.id} | Error={str(e)}"
+        )
+
     updated_count = LiveParticipant.objects.filter(
         session=session,
         left_at__isnull=True
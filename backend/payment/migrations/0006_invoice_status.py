@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def backfill_invoice_status(apps, schema_editor):
+    Invoice = apps.get_model("payment", "Invoice")
+    Invoice.objects.exclude(pdf_file__isnull=True).exclude(pdf_file="").update(status="ready")
+    # Existing invoices without a PDF have no task queued; failed lets a download re-queue them.
+    Invoice.objects.exclude(status="ready").update(status="failed")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0005_alter_invoice_pdf_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_invoice_status, migrations.RunPython.noop),
+    ]
@@ -34,10 +34,17 @@ class Order(models.Model):
         return f"{self.course.title} - {self.student.username} - {self.status}"
 
 class Invoice(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     student = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,related_name="invoices")
     purchase = models.OneToOneField("CoursePurchase",on_delete=models.CASCADE,related_name="invoice")
     invoice_number = models.CharField(max_length=20,unique=True)
     pdf_file = models.URLField(max_length=1000,null=True,blank=True)
+    status = models.CharField(max_length=10,choices=STATUS_CHOICES,default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
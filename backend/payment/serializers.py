@@ -26,6 +26,10 @@ class OrderSerializer(serializers.ModelSerializer):
         source="purchase.invoice.id",
         read_only=True
     )
+    invoice_status = serializers.CharField(
+        source="purchase.invoice.status",
+        read_only=True
+    )
 
     class Meta:
         model = Order
@@ -39,6 +43,7 @@ class OrderSerializer(serializers.ModelSerializer):
             "payment_id",
             "invoice_number",
             "invoice_id",
+            "invoice_status",
         ]
         read_only_fields = fields
 
@@ -48,7 +53,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Invoice
-        fields = ['id', 'invoice_number', 'created_at', 'course_title', 'pdf_url']
+        fields = ['id', 'invoice_number', 'created_at', 'course_title', 'pdf_url', 'status']
         
     def get_pdf_url(self, obj):
         if obj.pdf_file:
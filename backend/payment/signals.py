@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CoursePurchase
+from .utils import forget_enrollment
+
+
+@receiver(post_save, sender=CoursePurchase)
+@receiver(post_delete, sender=CoursePurchase)
+def purchase_changed(sender, instance, **kwargs):
+    course_id, student_id = instance.course_id, instance.student_id
+    forget_enrollment(course_id, student_id)
+    # Again after commit, in case a reader cached the old answer before the row was visible.
+    transaction.on_commit(lambda: forget_enrollment(course_id, student_id))
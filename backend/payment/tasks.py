@@ -0,0 +1,87 @@
+from celery import shared_task
+import logging
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Invoice
+from .utils import create_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, max_retries=5)
+def generate_invoice_pdf_task(self, invoice_id):
+    try:
+        invoice = Invoice.objects.select_related(
+            "student", "purchase__course", "purchase__order"
+        ).get(id=invoice_id)
+    except Invoice.DoesNotExist:
+        return
+
+    if invoice.status == "ready":
+        return
+
+    try:
+        invoice.pdf_file = create_invoice_pdf(invoice)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=settings.INVOICE_RETRY_DELAY * 2 ** self.request.retries)
+
+        logger.error(f"Invoice {invoice.invoice_number} generation failed after retries: {e}")
+        # A concurrent re-queued run may have finished meanwhile; never downgrade a ready invoice.
+        if not Invoice.objects.filter(id=invoice.id, status="pending").update(status="failed"):
+            return
+        invoice.status = "failed"
+    else:
+        invoice.status = "ready"
+        invoice.save(update_fields=["pdf_file", "status"])
+
+    notify_invoice_status(invoice)
+
+def invoice_queued_key(invoice_id):
+    return f"invoice_queued:{invoice_id}"
+
+def _delay_invoice(invoice_id):
+    # The payment is already committed; a broker outage must not turn it into an error.
+    try:
+        generate_invoice_pdf_task.delay(invoice_id)
+    except Exception as e:
+        logger.error(f"Could not queue invoice {invoice_id} generation: {e}")
+
+def queue_invoice_generation(invoice_id):
+    cache.set(invoice_queued_key(invoice_id), 1, timeout=settings.INVOICE_STALE_SECONDS)
+    _delay_invoice(invoice_id)
+
+def requeue_stale_invoice(invoice_id):
+    # At most one re-queue per stale window, however many requests or sweeps ask for it.
+    if cache.add(invoice_queued_key(invoice_id), 1, timeout=settings.INVOICE_STALE_SECONDS):
+        logger.warning(f"Re-queueing stale pending invoice {invoice_id}")
+        _delay_invoice(invoice_id)
+
+def is_stale(invoice):
+    return invoice.created_at < timezone.now() - timedelta(seconds=settings.INVOICE_STALE_SECONDS)
+
+@shared_task
+def requeue_stale_invoices_task():
+    cutoff = timezone.now() - timedelta(seconds=settings.INVOICE_STALE_SECONDS)
+    for invoice_id in Invoice.objects.filter(status="pending", created_at__lt=cutoff).values_list("id", flat=True):
+        requeue_stale_invoice(invoice_id)
+
+def notify_invoice_status(invoice):
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            f"user_{invoice.student_id}",
+            {
+                "type": "notify.message",
+                "payload": {
+                    "event": "invoice_status",
+                    "invoice_id": invoice.id,
+                    "invoice_number": invoice.invoice_number,
+                    "status": invoice.status,
+                }
+            }
+        )
+    except Exception as e:
+        logger.error(f"Invoice notify failed for invoice {invoice.id}: {e}")
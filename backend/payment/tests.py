@@ -1,3 +1,139 @@
-from django.test import TestCase
+import hashlib
+import hmac
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient
+
+from courses.models import Course
+from users.models import CustomUser
+from .models import CoursePurchase, Invoice, Order
+from .tasks import invoice_queued_key, requeue_stale_invoices_task
+
+
+class PaymentFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.student = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+        self.course = Course.objects.create(title="Django", description="", instructor=instructor, price=499)
+        self.client.force_authenticate(self.student)
+
+
+@override_settings(RAZORPAY_KEY_SECRET="secret", CELERY_TASK_ALWAYS_EAGER=True)
+class InvoiceGenerationTests(PaymentFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        Order.objects.create(student=self.student, course=self.course, order_id="order_1", amount=499)
+
+    def verify(self):
+        signature = hmac.new(b"secret", b"order_1|pay_1", hashlib.sha256).hexdigest()
+        return self.client.post(
+            "/api/payment/verify-payment/",
+            {"razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1", "razorpay_signature": signature},
+            format="json",
+        )
+
+    @mock.patch("payment.tasks.create_invoice_pdf", return_value="https://cdn.example.com/invoice.pdf")
+    def test_invoice_is_generated_after_payment_commits(self, create_invoice_pdf):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.verify()
+
+        self.assertEqual(response.data["invoice_status"], "pending")
+        create_invoice_pdf.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+
+        invoice = Invoice.objects.get(id=response.data["invoice_id"])
+        self.assertEqual((invoice.status, invoice.pdf_file), ("ready", "https://cdn.example.com/invoice.pdf"))
+
+    @mock.patch("payment.tasks.create_invoice_pdf", side_effect=RuntimeError("upload failed"))
+    def test_failed_generation_is_reported_and_not_downloadable(self, create_invoice_pdf):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.verify()
+
+        invoice = Invoice.objects.get(id=response.data["invoice_id"])
+        self.assertEqual(invoice.status, "failed")
+        self.assertEqual(create_invoice_pdf.call_count, 6)
+
+        download = self.client.get(f"/api/payment/invoices/{invoice.id}/download/")
+        self.assertEqual(download.status_code, 202)
+
+    @mock.patch("payment.tasks.notify_invoice_status")
+    @mock.patch("payment.tasks.create_invoice_pdf")
+    def test_final_failure_does_not_downgrade_an_invoice_finished_elsewhere(self, create_invoice_pdf, notify):
+        def fail(invoice):
+            if create_invoice_pdf.call_count == 6:
+                # A re-queued run finishes while this one is on its last attempt.
+                Invoice.objects.filter(id=invoice.id).update(status="ready", pdf_file="https://cdn.example.com/other.pdf")
+            raise RuntimeError("upload failed")
+        create_invoice_pdf.side_effect = fail
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.verify()
+
+        self.assertEqual(Invoice.objects.get(id=response.data["invoice_id"]).status, "ready")
+        notify.assert_not_called()
+
+    @mock.patch("payment.tasks.generate_invoice_pdf_task.delay", side_effect=OperationalError("refused"))
+    def test_broker_outage_does_not_fail_the_payment(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Invoice.objects.get(id=response.data["invoice_id"]).status, "pending")
+        delay.assert_called_once()
+
+    @mock.patch("payment.utils.cache.delete", side_effect=redis.ConnectionError("down"))
+    @mock.patch("payment.tasks.create_invoice_pdf", return_value="https://cdn.example.com/invoice.pdf")
+    def test_enrollment_cache_outage_does_not_fail_the_payment(self, create_invoice_pdf, delete):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.verify()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(CoursePurchase.objects.filter(student=self.student).exists())
+        delete.assert_called()
+
+    @mock.patch("payment.tasks.generate_invoice_pdf_task.delay")
+    def test_failed_and_stale_invoices_are_requeued_once(self, delay):
+        invoice_id = self.verify().data["invoice_id"]
+        url = f"/api/payment/invoices/{invoice_id}/download/"
+
+        Invoice.objects.filter(id=invoice_id).update(status="failed")
+        self.assertEqual([self.client.get(url).status_code for _ in range(2)], [202, 202])
+        self.assertEqual(delay.call_count, 1)
+
+        cache.delete(invoice_queued_key(invoice_id))
+        Invoice.objects.filter(id=invoice_id).update(created_at=timezone.now() - timedelta(hours=1))
+        self.client.get(url)
+        self.client.get(url)
+        requeue_stale_invoices_task()
+        self.assertEqual(delay.call_count, 2)
+
+
+class InvoiceDownloadTests(PaymentFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.invoice = Invoice.objects.create(
+            student=self.student,
+            purchase=CoursePurchase.objects.create(student=self.student, course=self.course),
+            invoice_number="INV202601010001",
+            pdf_file="https://cdn.example.com/invoice.pdf",
+            status="ready",
+        )
+
+    def test_download_redirects_to_the_cdn(self):
+        response = self.client.get(f"/api/payment/invoices/{self.invoice.id}/download/")
+
+        self.assertRedirects(response, "https://cdn.example.com/invoice.pdf", fetch_redirect_response=False)
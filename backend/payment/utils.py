@@ -5,14 +5,48 @@ from reportlab.pdfgen import canvas
 import io
 import cloudinary.uploader
 import logging
+import redis
+from django.core.cache import cache
 
 logger = logging.getLogger(__name__)
 
+ENROLLMENT_CACHE_TIMEOUT = 60 * 10
+
 def can_access_course(user, course):
     if course.is_free:
         return True
     return CoursePurchase.objects.filter(student=user, course=course).exists()
 
+def enrollment_cache_key(course_id, user_id):
+    return f"enrolled:{course_id}:{user_id}"
+
+def is_enrolled(course_id, user_id):
+    key = enrollment_cache_key(course_id, user_id)
+    try:
+        enrolled = cache.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Enrollment cache unavailable: {e}")
+        return CoursePurchase.objects.filter(course_id=course_id, student_id=user_id).exists()
+
+    if enrolled is None:
+        enrolled = CoursePurchase.objects.filter(course_id=course_id, student_id=user_id).exists()
+        try:
+            cache.set(key, enrolled, ENROLLMENT_CACHE_TIMEOUT)
+        except redis.RedisError as e:
+            logger.warning(f"Could not cache enrollment {key}: {e}")
+    return enrolled
+
+def is_course_member(course, user_id):
+    return course.instructor_id == user_id or is_enrolled(course.id, user_id)
+
+def forget_enrollment(course_id, user_id):
+    # Called from purchase signals; a cache outage must not roll back the purchase.
+    key = enrollment_cache_key(course_id, user_id)
+    try:
+        cache.delete(key)
+    except redis.RedisError as e:
+        logger.warning(f"Could not forget enrollment {key}: {e}")
+
 def generate_invoice_number():
     today = datetime.now().strftime("%Y%m%d")
     from .models import Invoice
@@ -66,4 +100,4 @@ def create_invoice_pdf(invoice):
 
     except Exception as e:
         logger.error("Invoice PDF generation failed: %s", str(e))
-        raise
\ No newline at end of file
+        raise
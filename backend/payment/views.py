@@ -4,7 +4,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import status
 from django.conf import settings
-from django.http import HttpResponse,FileResponse
+from django.shortcuts import redirect
 from .models import Order,CoursePurchase,Invoice
 from .serializers import OrderSerializer,CoursePurchaseSerializer,InvoiceSerializer
 from users.permissions import IsStudentUser
@@ -14,10 +14,10 @@ from django.db import transaction
 import razorpay
 import hmac
 import hashlib
-import requests
 import logging
 from rest_framework.decorators import api_view
-from .utils import generate_invoice_number,create_invoice_pdf
+from .utils import generate_invoice_number
+from .tasks import is_stale,queue_invoice_generation,requeue_stale_invoice
 
 logger = logging.getLogger(__name__)
 
@@ -72,7 +72,7 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
 
         return Order.objects.filter(
             student=self.request.user
-        ).select_related("course").order_by("-created_at")
+        ).select_related("course", "purchase__invoice").order_by("-created_at")
 
 class CreateRazorpayOrder(APIView):
     permission_classes = [permissions.IsAuthenticated,IsStudentUser]
@@ -272,18 +272,19 @@ class VerifyRazorpayPayment(APIView):
             if inv_created:
 
                 logger.info(
-                    f"Generating invoice for order {order_id}"
+                    f"Queueing invoice generation for order {order_id}"
+                )
+
+                transaction.on_commit(
+                    lambda: queue_invoice_generation(invoice.id)
                 )
 
-                pdf_url = create_invoice_pdf(invoice)
-                invoice.pdf_file = pdf_url
-                invoice.save()
-                
         return Response({
-            "message":"Payment success & invoice generated",
+            "message":"Payment success",
             "course_id":order.course.id,
             "invoice_id":invoice.id,
-            "invoice_number":invoice.invoice_number})   
+            "invoice_number":invoice.invoice_number,
+            "invoice_status":invoice.status})   
 
 class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class=InvoiceSerializer
@@ -293,31 +294,42 @@ class InvoiceViewSet(viewsets.ReadOnlyModelViewSet):
         logger.info(f"Fetching invoices for user {self.request.user.id}")
 
         return Invoice.objects.filter(student = self.request.user).select_related('purchase__course')
+
+    def unavailable(self, invoice):
+        if invoice.status == "failed":
+            # Give a failed invoice another round of retries when the student asks for it again;
+            # only the request that flips it back to pending queues the task.
+            if Invoice.objects.filter(id=invoice.id, status="failed").update(status="pending"):
+                queue_invoice_generation(invoice.id)
+            invoice.status = "pending"
+        elif invoice.status == "pending" and is_stale(invoice):
+            requeue_stale_invoice(invoice.id)
+
+        if invoice.status == "pending":
+            return Response({"status":invoice.status,"detail":"Invoice is being generated"},status=status.HTTP_202_ACCEPTED)
+        return Response({"error":"Invoice not available"},status=404)
     
     @action(detail=True,methods=['get'])
     def download(self,request,pk=None):
         invoice = self.get_object()
 
-        if not invoice.pdf_file:
-            logger.warning(f"Invoice {invoice.id} requested but PDF missing")
-            return Response({"error":"Invoice not available"},status=404)
-
-        pdf_response = requests.get(invoice.pdf_file)
+        if invoice.status != "ready" or not invoice.pdf_file:
+            logger.warning(f"Invoice {invoice.id} requested but PDF is {invoice.status}")
+            return self.unavailable(invoice)
 
         logger.info(
             f"Invoice {invoice.invoice_number} downloaded by user {request.user.id}"
         )
 
-        response = HttpResponse(pdf_response.content,content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment;filename="invoice={invoice.invoice_number}.pdf"'
-        return response
+        # The PDF is already on the CDN; proxying it would only tie up a worker.
+        return redirect(invoice.pdf_file)
     
     @action(detail=True,methods=['get'])
     def view(self,request,pk=None):
         invoice = self.get_object()
 
-        if not invoice.pdf_file:
-            return Response({"error": "Invoice not available"}, status=404)
+        if invoice.status != "ready" or not invoice.pdf_file:
+            return self.unavailable(invoice)
 
         logger.info(
             f"Invoice {invoice.invoice_number} viewed by user {request.user.id}"
@@ -0,0 +1,114 @@
+import logging
+import time
+import redis
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_STATS_KEY = "cache:stats"
+DEFAULT_TIMEOUT = 60 * 5
+
+
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+def _new_version():
+    # Time based so an evicted tag never restarts at a version that is still cached.
+    return int(time.time() * 1000)
+
+def get_tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        versions.update(cache.get_many(missing))
+
+    return [versions[key] for key in keys]
+
+def _bump_tags(tags):
+    # Runs after commit; a cache outage only leaves entries stale until they expire.
+    try:
+        for tag in tags:
+            key = _tag_key(tag)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _new_version(), None)
+    except redis.RedisError as e:
+        logger.warning(f"Could not invalidate cache tags {tags}: {e}")
+
+def invalidate_tags(*tags):
+    transaction.on_commit(lambda: _bump_tags(tags))
+
+def record_cache_stat(name, outcome):
+    try:
+        get_redis().hincrby(CACHE_STATS_KEY, f"{name}:{outcome}", 1)
+    except redis.RedisError as e:
+        logger.debug(f"Could not record cache stat {name}:{outcome}: {e}")
+
+def get_cache_stats():
+    stats = {}
+    for field, count in get_redis().hgetall(CACHE_STATS_KEY).items():
+        name, outcome = field.rsplit(":", 1)
+        stats.setdefault(name, {"hit": 0, "miss": 0})[outcome] = int(count)
+
+    for counts in stats.values():
+        total = counts["hit"] + counts["miss"]
+        counts["hit_ratio"] = round(counts["hit"] / total, 4) if total else 0
+    return stats
+
+def cache_aside(name, key, builder, tags=(), timeout=DEFAULT_TIMEOUT):
+    try:
+        versions = get_tag_versions(tags)
+        cache_key = ":".join([name, str(key), *map(str, versions)])
+        value = cache.get(cache_key)
+    except redis.RedisError as e:
+        logger.warning(f"Cache unavailable for {name}, building directly: {e}")
+        return builder()
+
+    if value is not None:
+        record_cache_stat(name, "hit")
+        return value
+
+    record_cache_stat(name, "miss")
+    value = builder()
+    try:
+        cache.set(cache_key, value, timeout)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store {name} in cache: {e}")
+    return value
+
+def query_cache_key(request):
+    # lists() keeps repeated parameters such as ?tag=a&tag=b distinct in the key.
+    return "&".join(f"{key}={value}" for key, values in sorted(request.query_params.lists()) for value in values)
+
+
+class AnonymousResponseCacheMixin:
+    """Serve GET responses for anonymous JSON clients from the cache as rendered bytes."""
+    response_cache_timeout = DEFAULT_TIMEOUT
+
+    def cached_response(self, name, key, builder, tags=()):
+        request = self.request
+        if request.user.is_authenticated or request.accepted_renderer.format != "json":
+            return builder()
+
+        def render():
+            response = builder()
+            content = request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            return content, request.accepted_media_type
+
+        content, content_type = cache_aside(
+            name, key, render, tags=tags, timeout=self.response_cache_timeout
+        )
+        return HttpResponse(content, content_type=content_type)
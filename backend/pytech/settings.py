@@ -110,17 +110,33 @@ CORS_ALLOW_CREDENTIALS = True
 
 ROOT_URLCONF = 'pytech.urls'
 
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_URL = os.getenv("REDIS_URL", f"redis://{REDIS_HOST}:6379/2")
+ASYNC_REDIS_MAX_CONNECTIONS = int(os.getenv("ASYNC_REDIS_MAX_CONNECTIONS", 100))
+ASYNC_REDIS_POOL_TIMEOUT = int(os.getenv("ASYNC_REDIS_POOL_TIMEOUT", 5))
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", f"redis://{REDIS_HOST}:6379/1"),
+        "KEY_PREFIX": "pytech",
+        "TIMEOUT": 300,
+    }
+}
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            "hosts": [(os.getenv("REDIS_HOST", "localhost"), 6379)],
+            "hosts": [(REDIS_HOST, 6379)],
         },
     },
 }
 
 ASGI_APPLICATION = 'pytech.asgi.application'
 
+WS_AUTH_USER_CACHE_TIMEOUT = int(os.getenv("WS_AUTH_USER_CACHE_TIMEOUT", 60))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -243,6 +259,39 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 
+WATCH_PROGRESS_BUFFER_ENABLED = os.getenv("WATCH_PROGRESS_BUFFER_ENABLED", "True") == "True"
+WATCH_PROGRESS_FLUSH_SECONDS = int(os.getenv("WATCH_PROGRESS_FLUSH_SECONDS", 10))
+LIVE_ATTENDANCE_PERSIST_SECONDS = int(os.getenv("LIVE_ATTENDANCE_PERSIST_SECONDS", 60))
+LIVE_EVENT_BATCH_MS = int(os.getenv("LIVE_EVENT_BATCH_MS", 250))
+LIVE_REACTION_RATE = int(os.getenv("LIVE_REACTION_RATE", 3))
+LIVE_EMAIL_CHUNK_SIZE = int(os.getenv("LIVE_EMAIL_CHUNK_SIZE", 200))
+LIVE_EMAIL_RETRY_DELAY = int(os.getenv("LIVE_EMAIL_RETRY_DELAY", 30))
+INVOICE_RETRY_DELAY = int(os.getenv("INVOICE_RETRY_DELAY", 10))
+# Longer than the task's own retry backoff, so only lost jobs are re-queued.
+INVOICE_STALE_SECONDS = int(os.getenv("INVOICE_STALE_SECONDS", 900))
+CERTIFICATE_RETRY_DELAY = int(os.getenv("CERTIFICATE_RETRY_DELAY", 10))
+CERTIFICATE_UPLOAD_CONCURRENCY = int(os.getenv("CERTIFICATE_UPLOAD_CONCURRENCY", 8))
+CERTIFICATE_STALE_SECONDS = int(os.getenv("CERTIFICATE_STALE_SECONDS", 900))
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-watch-progress": {
+        "task": "courses.tasks.flush_watch_progress_task",
+        "schedule": WATCH_PROGRESS_FLUSH_SECONDS,
+    },
+    "persist-live-attendance": {
+        "task": "livesession.tasks.persist_live_attendance_task",
+        "schedule": LIVE_ATTENDANCE_PERSIST_SECONDS,
+    },
+    "requeue-stale-invoices": {
+        "task": "payment.tasks.requeue_stale_invoices_task",
+        "schedule": INVOICE_STALE_SECONDS,
+    },
+    "requeue-stale-certificates": {
+        "task": "courses.tasks.requeue_stale_certificates_task",
+        "schedule": CERTIFICATE_STALE_SECONDS,
+    },
+}
+
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
@@ -0,0 +1,10 @@
+def iter_chunks(values, size):
+    # Streams a values_list queryset in fixed-size lists without loading it all at once.
+    chunk = []
+    for value in values.iterator(chunk_size=size):
+        chunk.append(value)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -1,3 +1,164 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from courses.models import Course, CourseCertificate, Lesson, LessonProgress, Module
+from courses.tasks import certificate_queued_key, refresh_course_progress_task, requeue_stale_certificates_task
+from payment.models import CoursePurchase
+from users.models import CustomUser
+from .models import Option, Question, Quiz, UserAnswer
+
+
+class QuizFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.student = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+        self.course = Course.objects.create(
+            title="Django", description="", instructor=instructor, status="approved", is_published=True
+        )
+        lesson = Lesson.objects.create(
+            module=Module.objects.create(course=self.course, title="Basics"),
+            title="Intro",
+            content_type="text",
+            duration=100,
+        )
+        CoursePurchase.objects.create(student=self.student, course=self.course)
+        LessonProgress.objects.create(student=self.student, lesson=lesson, watched_seconds=100, completed=True)
+        refresh_course_progress_task(self.course.id)
+
+        self.quiz = Quiz.objects.create(course=self.course, title="Final")
+        self.questions = []
+        for index in range(3):
+            question = Question.objects.create(quiz=self.quiz, text=f"Question {index}", marks=2)
+            question.correct = Option.objects.create(question=question, text="Right", is_correct=True)
+            question.wrong = Option.objects.create(question=question, text="Wrong")
+            self.questions.append(question)
+        self.client.force_authenticate(self.student)
+
+    def submit(self, answers):
+        return self.client.post(
+            f"/api/quiz/quizzes/{self.quiz.id}/submit/",
+            {"answers": [
+                {"question_id": question.id, "option_id": option.id} for question, option in answers
+            ]},
+            format="json",
+        )
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class CertificateIssueTests(QuizFixtureMixin, TestCase):
+    @mock.patch("courses.tasks.generate_certificate_file")
+    def test_passing_quiz_issues_certificate_and_renders_after_commit(self, generate_certificate_file):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.submit([(question, question.correct) for question in self.questions])
+
+        self.assertTrue(response.data["is_passed"])
+        certificate = CourseCertificate.objects.get(student=self.student, course=self.course)
+        self.assertFalse(certificate.certificate_file)
+        self.assertTrue(CoursePurchase.objects.get(student=self.student).progress_locked)
+        generate_certificate_file.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        generate_certificate_file.assert_called_once_with(certificate)
+
+    @mock.patch("courses.utils.upload_certificate_pdf", side_effect=RuntimeError("upload failed"))
+    def test_failed_render_is_marked_and_requeued_from_download(self, upload_certificate_pdf):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit([(question, question.correct) for question in self.questions])
+
+        certificate = CourseCertificate.objects.get(student=self.student, course=self.course)
+        self.assertEqual(certificate.status, "failed")
+        self.assertEqual(upload_certificate_pdf.call_count, 6)
+
+        upload_certificate_pdf.side_effect = None
+        upload_certificate_pdf.return_value = "certificates/final.pdf"
+        response = self.client.get(f"/api/certificate/{certificate.certificate_id}/download/")
+
+        self.assertEqual(response.status_code, 202)
+        certificate.refresh_from_db()
+        self.assertEqual((certificate.status, certificate.certificate_file.name), ("ready", "certificates/final.pdf"))
+
+
+    @mock.patch("courses.tasks.generate_certificate_task.delay")
+    def test_stale_pending_certificate_is_requeued_once(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit([(question, question.correct) for question in self.questions])
+        certificate = CourseCertificate.objects.get(student=self.student, course=self.course)
+        url = f"/api/certificate/{certificate.certificate_id}/download/"
+        self.assertEqual(delay.call_count, 1)
+
+        # The render job was lost: once the queued marker expires the download re-queues it once.
+        cache.delete(certificate_queued_key(certificate.id))
+        CourseCertificate.objects.filter(id=certificate.id).update(issued_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual([self.client.get(url).status_code for _ in range(2)], [202, 202])
+        self.assertEqual(delay.call_count, 2)
+        requeue_stale_certificates_task()
+        self.assertEqual(delay.call_count, 2)
+
+        cache.delete(certificate_queued_key(certificate.id))
+        requeue_stale_certificates_task()
+        self.assertEqual(delay.call_count, 3)
+
+class QuizGradingTests(QuizFixtureMixin, TestCase):
+    def test_grading_query_count_does_not_grow_with_questions(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self.submit([(question, question.wrong) for question in self.questions])
+        self.assertEqual(response.data["score"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(7):
+                question = Question.objects.create(quiz=self.quiz, text=f"Extra {index}", marks=1)
+                question.correct = Option.objects.create(question=question, text="Right", is_correct=True)
+                question.wrong = Option.objects.create(question=question, text="Wrong")
+                self.questions.append(question)
+
+        answers = [(question, question.correct) for question in self.questions[:2]]
+        answers += [(question, question.wrong) for question in self.questions[2:]]
+        with CaptureQueriesContext(connection) as large:
+            response = self.submit(answers)
+
+        self.assertEqual((response.data["score"], response.data["percentage"]), (4, 30.77))
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(UserAnswer.objects.filter(attempt__attempt_number=2).count(), 10)
+
+    def test_answers_must_cover_each_question_once_with_its_own_options(self):
+        first, second, third = self.questions
+        for answers in (
+            [(first, first.correct), (first, first.correct), (second, second.correct)],
+            [(first, first.correct), (second, third.correct), (third, third.correct)],
+            [(first, first.correct), (second, second.correct)],
+        ):
+            self.assertEqual(self.submit(answers).status_code, 400)
+
+
+class QuizSnapshotTests(QuizFixtureMixin, TestCase):
+    def test_students_get_cached_snapshot_without_answers_until_an_edit_commits(self):
+        url = f"/api/quiz/quizzes/{self.quiz.id}/"
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data["questions"]), 3)
+        self.assertNotIn("is_correct", response.data["questions"][0]["options"][0])
+        self.assertFalse(any("quiz_question" in query["sql"] for query in queries))
+
+        question = self.questions[0]
+        self.client.force_authenticate(self.course.instructor)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/quiz/questions/{question.id}/", {"text": "Edited"}, format="json")
+
+        self.client.force_authenticate(self.student)
+        response = self.client.get(url)
+        self.assertEqual(response.data["questions"][0]["text"], "Edited")
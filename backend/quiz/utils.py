@@ -0,0 +1,139 @@
+import logging
+import redis
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from pytech.cache import get_tag_versions, invalidate_tags, record_cache_stat
+from .models import Quiz, Option
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+QUIZ_FIELDS = ("id", "course_id", "title", "pass_percentage", "time_limit", "max_attempts")
+
+
+def quiz_tag(quiz_id):
+    return f"quiz:{quiz_id}"
+
+def invalidate_quiz(quiz_id):
+    invalidate_tags(quiz_tag(quiz_id))
+
+def snapshot_keys(quiz_id):
+    version = get_tag_versions([quiz_tag(quiz_id)])[0]
+    return version, f"quiz_snapshot:{quiz_id}:{version}:student", f"quiz_snapshot:{quiz_id}:{version}:answers"
+
+def build_quiz_snapshot(quiz_id, version=None):
+    quiz = Quiz.objects.prefetch_related(
+        Prefetch("questions__options", queryset=Option.objects.order_by("id"))
+    ).only(*QUIZ_FIELDS).get(id=quiz_id)
+    questions = sorted(quiz.questions.all(), key=lambda question: question.id)
+
+    meta = {
+        "id": quiz.id,
+        "course": quiz.course_id,
+        "title": quiz.title,
+        "pass_percentage": quiz.pass_percentage,
+        "time_limit": quiz.time_limit,
+        "max_attempts": quiz.max_attempts,
+    }
+
+    # The student payload never contains is_correct; the answer key lives in its own cache entry.
+    student = {
+        **meta,
+        "version": version,
+        "questions": [
+            {
+                "id": question.id,
+                "text": question.text,
+                "marks": question.marks,
+                "options": [{"id": option.id, "text": option.text} for option in question.options.all()],
+            }
+            for question in questions
+        ],
+    }
+    answers = {
+        **meta,
+        "version": version,
+        "questions": [
+            {
+                "id": question.id,
+                "text": question.text,
+                "marks": question.marks,
+                "options": [
+                    {"id": option.id, "text": option.text, "is_correct": option.is_correct}
+                    for option in question.options.all()
+                ],
+            }
+            for question in questions
+        ],
+        "marks": {question.id: question.marks for question in questions},
+        "options": {
+            option.id: (question.id, option.is_correct)
+            for question in questions
+            for option in question.options.all()
+        },
+    }
+    return student, answers
+
+def compile_quiz(quiz_id):
+    try:
+        # Read the version first so an edit racing the build lands under a newer version.
+        version, student_key, answers_key = snapshot_keys(quiz_id)
+    except redis.RedisError as e:
+        logger.warning(f"Quiz snapshot cache unavailable for quiz {quiz_id}: {e}")
+        return build_quiz_snapshot(quiz_id)
+
+    snapshot = build_quiz_snapshot(quiz_id, version)
+    try:
+        cache.set_many({student_key: snapshot[0], answers_key: snapshot[1]}, SNAPSHOT_TIMEOUT)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store quiz snapshot for quiz {quiz_id}: {e}")
+    return snapshot
+
+def schedule_quiz_compile(quiz_id):
+    transaction.on_commit(lambda: compile_quiz(quiz_id))
+
+def _get_snapshot_part(quiz_id, part):
+    try:
+        key = snapshot_keys(quiz_id)[part + 1]
+        value = cache.get(key)
+    except redis.RedisError as e:
+        logger.warning(f"Quiz snapshot cache unavailable for quiz {quiz_id}: {e}")
+        return build_quiz_snapshot(quiz_id)[part]
+
+    if value is not None:
+        record_cache_stat("quiz_snapshot", "hit")
+        return value
+
+    record_cache_stat("quiz_snapshot", "miss")
+    return compile_quiz(quiz_id)[part]
+
+def get_student_quiz(quiz_id):
+    return _get_snapshot_part(quiz_id, 0)
+
+def get_quiz_answers(quiz_id):
+    return _get_snapshot_part(quiz_id, 1)
+
+# None unless every question is answered exactly once with one of its own options.
+def grade_answers(answer_key, answers):
+    marks, options = answer_key["marks"], answer_key["options"]
+
+    graded = {}
+    for item in answers:
+        try:
+            question_id, option_id = int(item["question_id"]), int(item["option_id"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        question_of_option, is_correct = options.get(option_id, (None, False))
+        if question_id not in marks or question_of_option != question_id or question_id in graded:
+            return None
+        graded[question_id] = (option_id, is_correct)
+
+    if len(graded) != len(marks):
+        return None
+
+    total = sum(marks.values())
+    obtained = sum(marks[question_id] for question_id, (_, is_correct) in graded.items() if is_correct)
+    return obtained, total, graded
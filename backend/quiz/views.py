@@ -1,5 +1,4 @@
 import logging
-from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
 
@@ -9,9 +8,10 @@ from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 
 from users.permissions import IsInstructorUser
-from .models import Quiz, Question, Option, UserQuizAttempt, UserAnswer
+from .models import Quiz, Question, UserQuizAttempt, UserAnswer
 from .serializers import QuizSerializer, QuizSubmissionSerializer, QuestionSerializer, AttemptDetailSerializer
-from courses.utils import issue_certificate_if_eligible
+from .utils import get_quiz_answers, get_student_quiz, grade_answers, schedule_quiz_compile
+from courses.utils import issue_certificate
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
@@ -61,7 +61,16 @@ class QuizViewSet(viewsets.ModelViewSet):
                 )
    
         logger.info(f"Quiz {quiz.id} fetched by user {request.user.id}")
-        return super().retrieve(request, *args, **kwargs)
+
+        if user.is_staff or user.role in ["instructor", "admin"]:
+            snapshot = get_quiz_answers(quiz.id)
+        else:
+            snapshot = get_student_quiz(quiz.id)
+
+        return Response({
+            field: snapshot[field]
+            for field in ["id", "course", "title", "pass_percentage", "time_limit", "max_attempts", "questions"]
+        })
     
     def perform_create(self, serializer):
         quiz = serializer.save()
@@ -85,6 +94,7 @@ class QuizViewSet(viewsets.ModelViewSet):
             )
 
         serializer.save()
+        schedule_quiz_compile(quiz.id)
         logger.info(
             "Quiz updated | Tutor: %s | Quiz: %s",
             self.request.user.id,
@@ -139,6 +149,7 @@ class QuizViewSet(viewsets.ModelViewSet):
         serializer = QuestionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         serializer.save(quiz=quiz)
+        schedule_quiz_compile(quiz.id)
 
         logger.info(
             "Question added | Tutor: %s | Quiz: %s",
@@ -226,42 +237,15 @@ class QuizViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        questions = quiz.questions.all()
+        graded = grade_answers(get_quiz_answers(quiz.id), answers_data)
 
-        if len(answers_data) != questions.count():
+        if graded is None:
             return Response(
                 {"error": "All questions must be answered."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        total_marks = 0
-        obtained_marks = 0
-        validated_answers = []
-
-        for item in answers_data:
-            question = get_object_or_404(
-                Question,
-                id=item["question_id"],
-                quiz=quiz
-            )
-
-            selected_option = get_object_or_404(
-                Option,
-                id=item["option_id"],
-                question=question
-            )
-
-            total_marks += question.marks
-
-            is_correct = selected_option.is_correct
-            if is_correct:
-                obtained_marks += question.marks
-
-            validated_answers.append({
-                "question": question,
-                "selected_option": selected_option,
-                "is_correct": is_correct
-            })
+        obtained_marks, total_marks, answers = graded
 
         percentage = (
             (obtained_marks / total_marks) * 100
@@ -280,16 +264,19 @@ class QuizViewSet(viewsets.ModelViewSet):
             completed_at=timezone.now()
         )
 
-        for ans in validated_answers:
-            UserAnswer.objects.create(
+        UserAnswer.objects.bulk_create([
+            UserAnswer(
                 attempt=attempt,
-                question=ans["question"],
-                selected_option=ans["selected_option"],
-                is_correct=ans["is_correct"]
+                question_id=question_id,
+                selected_option_id=option_id,
+                is_correct=is_correct
             )
+            for question_id, (option_id, is_correct) in answers.items()
+        ])
 
         if is_passed:
-            issue_certificate_if_eligible(user, quiz.course)
+            # Progress and the pass were both checked above, so only the certificate row is written here.
+            issue_certificate(user, quiz.course)
 
         logger.info(
             f"Quiz submitted | User: {user.id} | "
@@ -355,6 +342,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
         )
 
         serializer.save()
+        schedule_quiz_compile(question.quiz_id)
 
         if not self.request.user.is_staff and course.status == "approved":
             course.status = "submitted"
@@ -373,6 +361,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
             f"Question deleted | Tutor: {self.request.user.id} | Question: {instance.id}"
         )
         instance.delete()  
+        schedule_quiz_compile(question.quiz_id)
 
         if not self.request.user.is_staff and course.status == "approved":
             course.status = "submitted"
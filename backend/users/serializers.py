@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import CustomUser,Profile,ProfileLink
+from .utils import add_user_claims
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import force_bytes, force_str
@@ -106,9 +107,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-        token['username'] = user.username
-        token['role'] = user.role  
-        return token      
+        return add_user_claims(token, user)
     
     def validate(self,attrs):
         try:
@@ -1,6 +1,16 @@
-from django.db.models.signals import post_save
+import logging
+import redis
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Profile,CustomUser
+from .models import Profile,ProfileLink,CustomUser
+from django.core.cache import cache
+from .utils import get_ws_user_cache_key,invalidate_student_portfolio
+from courses.models import Course,CourseCertificate
+from payment.models import CoursePurchase
+from quiz.models import UserQuizAttempt
+from pytech.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save,sender=CustomUser)
 def create_profile(sender,instance,created,**kwargs):
@@ -10,4 +20,63 @@ def create_profile(sender,instance,created,**kwargs):
             defaults={
                 "full_name":instance.username or instance.email
             }     
-        )
\ No newline at end of file
+        )
+
+@receiver(post_save,sender=CustomUser)
+def forget_ws_user(sender,instance,**kwargs):
+    try:
+        cache.delete(get_ws_user_cache_key(instance.id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not forget websocket user {instance.id}: {e}")
+
+@receiver(post_save,sender=CoursePurchase)
+@receiver(post_delete,sender=CoursePurchase)
+@receiver(post_save,sender=CourseCertificate)
+@receiver(post_delete,sender=CourseCertificate)
+def purchase_or_certificate_changed(sender,instance,**kwargs):
+    invalidate_student_portfolio(instance.student_id)
+
+# The portfolio embeds the student's username/email and the course titles.
+@receiver(post_save,sender=CustomUser)
+def user_portfolio_changed(sender,instance,created,update_fields=None,**kwargs):
+    if created:
+        return
+    if update_fields is not None and not {"username","email"} & set(update_fields):
+        return
+    invalidate_student_portfolio(instance.id)
+
+@receiver(post_save,sender=Course)
+def course_title_changed(sender,instance,created,update_fields=None,**kwargs):
+    if created:
+        return
+    if update_fields is not None and "title" not in update_fields:
+        return
+    student_ids = CoursePurchase.objects.filter(course_id=instance.id).values_list("student_id",flat=True)
+    invalidate_student_portfolio(*student_ids)
+
+@receiver(post_save,sender=UserQuizAttempt)
+@receiver(post_delete,sender=UserQuizAttempt)
+def quiz_attempt_changed(sender,instance,**kwargs):
+    invalidate_student_portfolio(instance.user_id)
+
+
+# The anonymous course detail response embeds the instructor's profile.
+def invalidate_instructor_courses(user_id):
+    course_ids = Course.objects.filter(instructor_id=user_id).values_list("id",flat=True)
+    tags = [f"course:{course_id}" for course_id in course_ids]
+    if tags:
+        invalidate_tags(*tags)
+
+@receiver(post_save,sender=Profile)
+@receiver(post_delete,sender=Profile)
+def profile_changed(sender,instance,**kwargs):
+    invalidate_instructor_courses(instance.user_id)
+
+@receiver(post_save,sender=ProfileLink)
+@receiver(post_delete,sender=ProfileLink)
+def profile_link_changed(sender,instance,**kwargs):
+    try:
+        user_id = instance.profile.user_id
+    except Profile.DoesNotExist:
+        return
+    invalidate_instructor_courses(user_id)
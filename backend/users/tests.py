@@ -1,3 +1,300 @@
-from django.test import TestCase
+from unittest.mock import patch
 
-# Create your tests here.
+import redis
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from courses.models import Course, CourseCategory, Module, Lesson
+from livesession.models import LiveSession
+from payment.models import CoursePurchase
+from pytech.cache import query_cache_key
+from quiz.models import Quiz, Question, Option, UserQuizAttempt
+from .models import CustomUser
+
+
+class CourseFixtureMixin:
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = CourseCategory.objects.create(name="Python")
+        self.instructor = CustomUser.objects.create_user(
+            email="tutor@example.com", username="tutor", password="pass", role="instructor"
+        )
+        self.student = CustomUser.objects.create_user(
+            email="student@example.com", username="student", password="pass"
+        )
+
+    def create_course(self, title, lessons_per_module):
+        course = Course.objects.create(
+            title=title,
+            description="",
+            instructor=self.instructor,
+            category=self.category,
+            status="approved",
+            is_published=True,
+        )
+        for module_order in range(3):
+            module = Module.objects.create(course=course, title=f"Module {module_order}", order=module_order)
+            for lesson_order in range(lessons_per_module):
+                Lesson.objects.create(
+                    module=module,
+                    title=f"Lesson {lesson_order}",
+                    content_type="video",
+                    video_source="youtube",
+                    video_url="https://www.youtube.com/watch?v=abc",
+                    duration=60,
+                    order=lesson_order,
+                )
+        CoursePurchase.objects.create(student=self.student, course=course)
+        return course
+
+
+class ApprovedCourseListQueryTests(CourseFixtureMixin, TestCase):
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("approved-courses"))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_catalog_query_count_is_independent_of_course_size(self):
+        self.client.force_authenticate(self.student)
+
+        self.create_course("Small", lessons_per_module=1)
+        _, small = self.count_queries()
+
+        for index in range(5):
+            self.create_course(f"Large {index}", lessons_per_module=20)
+        response, large = self.count_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.data["count"], 6)
+
+    def test_catalog_progress_matches_single_course_helper(self):
+        self.client.force_authenticate(self.student)
+        course = self.create_course("Progress", lessons_per_module=2)
+
+        lesson = Lesson.objects.filter(module__course=course).first()
+        self.client.post(
+            f"/api/lesson-progress/lessons/{lesson.id}/watch/", {"watched_seconds": 60}, format="json"
+        )
+
+        response, _ = self.count_queries()
+        card = response.data["results"][0]
+
+        self.assertTrue(card["is_purchased"])
+        self.assertEqual(card["progress_percentage"], round(100 / 6, 2))
+        self.assertNotIn("modules", card)
+
+    def test_anonymous_catalog_skips_viewer_lookups(self):
+        self.create_course("Public", lessons_per_module=5)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("approved-courses"))
+
+        self.assertFalse(response.json()["results"][0]["is_purchased"])
+        self.assertIsNone(response.json()["results"][0]["progress_percentage"])
+
+    def test_anonymous_catalog_is_cached_until_a_course_changes(self):
+        course = self.create_course("Public", lessons_per_module=1)
+        self.client.get(reverse("approved-courses"))
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("approved-courses"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = "Renamed"
+            course.save()
+
+        response = self.client.get(reverse("approved-courses"))
+        self.assertEqual(response.json()["results"][0]["title"], "Renamed")
+
+
+class CourseDetailQueryTests(CourseFixtureMixin, TestCase):
+    def create_course(self, title, lessons_per_module):
+        course = super().create_course(title, lessons_per_module)
+        quiz = Quiz.objects.create(course=course, title=f"{title} quiz")
+        for index in range(lessons_per_module):
+            question = Question.objects.create(quiz=quiz, text=f"Question {index}")
+            Option.objects.create(question=question, text="Yes", is_correct=True)
+            Option.objects.create(question=question, text="No")
+        return course
+
+    def count_detail_queries(self, course):
+        with self.assertNumQueries(12) as ctx:
+            response = self.client.get(reverse("approved-course-detail", args=[course.id]))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_detail_query_count_is_independent_of_lesson_count(self):
+        self.client.force_authenticate(self.student)
+
+        small_course = self.create_course("Small", lessons_per_module=1)
+        _, small = self.count_detail_queries(small_course)
+
+        large_course = self.create_course("Large", lessons_per_module=70)
+        response, large = self.count_detail_queries(large_course)
+
+        self.assertEqual(small, large)
+        lessons = [lesson for module in response.data["modules"] for lesson in module["lessons"]]
+        self.assertEqual(len(lessons), 210)
+        self.assertTrue(all(lesson["video_url"] for lesson in lessons))
+        self.assertEqual(len(response.data["final_quiz"]["questions"]), 70)
+
+    def test_detail_hides_paid_content_from_non_buyers(self):
+        course = self.create_course("Locked", lessons_per_module=2)
+        CoursePurchase.objects.filter(course=course).delete()
+        self.client.force_authenticate(self.student)
+
+        response = self.client.get(reverse("approved-course-detail", args=[course.id]))
+
+        self.assertFalse(response.data["is_purchased"])
+        for module in response.data["modules"]:
+            for lesson in module["lessons"]:
+                self.assertIsNone(lesson["video_url"])
+
+
+class StudentPortfolioTests(CourseFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.student)
+
+    def get_portfolio(self):
+        response = self.client.get(reverse("portfolio"))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_portfolio_queries_do_not_grow_with_courses(self):
+        for index in range(2):
+            course = self.create_course(f"Course {index}", lessons_per_module=1)
+            Quiz.objects.create(course=course, title=f"Quiz {index}")
+        with self.assertNumQueries(4) as ctx:
+            self.get_portfolio()
+        small = len(ctx.captured_queries)
+
+        for index in range(2, 6):
+            self.create_course(f"Course {index}", lessons_per_module=1)
+        cache.clear()
+        with self.assertNumQueries(small):
+            data = self.get_portfolio()
+
+        self.assertEqual(data["stats"]["total_enrolled"], 6)
+
+    def test_portfolio_is_cached_until_quiz_attempt(self):
+        course = self.create_course("Cached", lessons_per_module=1)
+        quiz = Quiz.objects.create(course=course, title="Final")
+        self.get_portfolio()
+
+        with self.assertNumQueries(0):
+            self.get_portfolio()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserQuizAttempt.objects.create(
+                user=self.student, quiz=quiz, score=8, percentage=80, is_passed=True, attempt_number=1
+            )
+            self.assertEqual(self.get_portfolio()["courses"][0]["quiz_average"], 0)
+        data = self.get_portfolio()
+        self.assertEqual(data["courses"][0]["quiz_average"], 80)
+
+    def test_portfolio_is_refreshed_when_course_title_or_username_changes(self):
+        course = self.create_course("Old title", lessons_per_module=1)
+        self.get_portfolio()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = "New title"
+            course.save()
+        self.assertEqual(self.get_portfolio()["courses"][0]["course_title"], "New title")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.username = "renamed"
+            self.student.save(update_fields=["username"])
+        self.assertEqual(self.get_portfolio()["profile"]["name"], "renamed")
+
+
+class UserCacheSignalTests(CourseFixtureMixin, TestCase):
+    @patch("users.signals.cache.delete", side_effect=redis.ConnectionError("down"))
+    def test_cache_outage_does_not_fail_user_save(self, delete):
+        self.student.username = "renamed"
+        self.student.save()
+
+        delete.assert_called_once()
+        self.assertEqual(CustomUser.objects.get(id=self.student.id).username, "renamed")
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class AnonymousResponseCacheTests(CourseFixtureMixin, TestCase):
+    def test_approval_shows_up_in_cached_catalog(self):
+        self.create_course("Live", lessons_per_module=1)
+        pending = self.create_course("Pending", lessons_per_module=1)
+        Course.objects.filter(id=pending.id).update(status="submitted", is_published=False)
+
+        self.assertEqual(self.client.get(reverse("approved-courses")).json()["count"], 1)
+        with self.assertNumQueries(0):
+            self.client.get(reverse("approved-courses"))
+
+        admin = CustomUser.objects.create_user(
+            email="admin@example.com", username="admin", password="pass", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/admin/courses/{pending.id}/approve/")
+        self.client.force_authenticate(None)
+
+        self.assertEqual(self.client.get(reverse("approved-courses")).json()["count"], 2)
+
+    def test_detail_is_refreshed_when_a_lesson_is_added(self):
+        course = self.create_course("Detail", lessons_per_module=1)
+        url = reverse("approved-course-detail", args=[course.id])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(
+                module=course.modules.first(), title="Extra", content_type="text", duration=30
+            )
+
+        lessons = [lesson for module in self.client.get(url).json()["modules"] for lesson in module["lessons"]]
+        self.assertEqual(len(lessons), 4)
+
+    def test_detail_is_refreshed_when_live_session_or_instructor_profile_changes(self):
+        course = self.create_course("Detail", lessons_per_module=1)
+        session = LiveSession.objects.create(course=course, title="Kickoff", created_by=self.instructor)
+        url = reverse("approved-course-detail", args=[course.id])
+        self.assertEqual(self.client.get(url).json()["live_session"]["status"], "scheduled")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.status = "ended"
+            session.save(update_fields=["status"])
+            profile = self.instructor.profile
+            profile.headline = "Django mentor"
+            profile.save()
+
+        data = self.client.get(url).json()
+        self.assertIsNone(data["live_session"])
+        self.assertEqual(data["instructor_profile"]["headline"], "Django mentor")
+
+    def test_cache_outage_during_invalidation_does_not_fail_the_request(self):
+        course = self.create_course("Outage", lessons_per_module=1)
+        Course.objects.filter(id=course.id).update(status="submitted", is_published=False)
+        admin = CustomUser.objects.create_user(
+            email="admin@example.com", username="admin", password="pass", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+        with patch("pytech.cache.cache.incr", side_effect=redis.ConnectionError("down")):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f"/api/admin/courses/{course.id}/approve/")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_cache_key_keeps_repeated_parameters(self):
+        first = Request(APIRequestFactory().get("/", {"category": ["1", "2"], "page": "1"}))
+        second = Request(APIRequestFactory().get("/", {"page": "1", "category": ["1"]}))
+
+        self.assertEqual(query_cache_key(first), "category=1&category=2&page=1")
+        self.assertNotEqual(query_cache_key(first), query_cache_key(second))
@@ -0,0 +1,33 @@
+import logging
+import redis
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_CACHE_TIMEOUT = 60 * 10
+
+def get_portfolio_cache_key(student_id):
+    return f"portfolio:{student_id}"
+
+def invalidate_student_portfolio(*student_ids):
+    # Deferred so a concurrent reader cannot re-cache the pre-commit state.
+    keys = [get_portfolio_cache_key(student_id) for student_id in student_ids]
+    if keys:
+        transaction.on_commit(lambda: _delete_portfolios(keys))
+
+def _delete_portfolios(keys):
+    try:
+        cache.delete_many(keys)
+    except redis.RedisError as e:
+        logger.warning(f"Could not invalidate portfolios {keys}: {e}")
+
+def add_user_claims(token, user):
+    token["username"] = user.username or user.email.split("@")[0]
+    token["email"] = user.email
+    token["role"] = user.role
+    token["is_staff"] = user.is_staff
+    return token
+
+def get_ws_user_cache_key(user_id):
+    return f"ws_user:{user_id}"
@@ -23,8 +23,12 @@ from django.core.mail import send_mail
 from courses.models import Course,Lesson,LessonProgress,LessonResource,CourseCertificate
 from payment.models import CoursePurchase
 from quiz.models import UserQuizAttempt
-from courses.serializers import AdminCourseSerializer,UserCourseDetailSerializer
-from django.db.models import Avg,Count,Sum,Max
+from courses.serializers import AdminCourseSerializer,UserCourseDetailSerializer,CourseCatalogSerializer
+from courses.utils import ViewerContext,course_stats_annotations,get_course_content_prefetch,get_course_progress_map
+from .utils import add_user_claims,get_portfolio_cache_key,PORTFOLIO_CACHE_TIMEOUT
+from pytech.cache import AnonymousResponseCacheMixin,query_cache_key
+from django.db.models import Avg,Count,Sum,Max,Q
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.parsers import MultiPartParser,FormParser
@@ -86,7 +90,7 @@ class LoginView(APIView):
             serializer = LoginSerializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
+            refresh = add_user_claims(RefreshToken.for_user(user), user)
             return Response({
                 'access': str(refresh.access_token),
                 'refresh': str(refresh),
@@ -218,11 +222,7 @@ class GoogleLoginView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        refresh = RefreshToken.for_user(user)
-
-        refresh["username"] = user.username or user.email.split("@")[0]
-        refresh["email"] = user.email
-        refresh["role"] = getattr(user, "role", "student")
+        refresh = add_user_claims(RefreshToken.for_user(user), user)
 
         return Response({
             "access":str(refresh.access_token),
@@ -241,8 +241,8 @@ class LogoutView(APIView):
         token.blacklist()
         return Response({"detail":"Logged out"})
        
-class ApprovedCourseListView(generics.ListAPIView):
-    serializer_class = UserCourseDetailSerializer
+class ApprovedCourseListView(AnonymousResponseCacheMixin,generics.ListAPIView):
+    serializer_class = CourseCatalogSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category','level']
@@ -250,45 +250,77 @@ class ApprovedCourseListView(generics.ListAPIView):
     ordering_fields = ['price','title','avg_rating']
     ordering = ['-updated_at']
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["viewer"] = ViewerContext(self.request.user)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        build = super().list
+        return self.cached_response(
+            "catalog",
+            query_cache_key(request),
+            lambda: build(request, *args, **kwargs),
+            tags=["catalog"]
+        )
+
     def get_queryset(self):
         return Course.objects.filter(
             is_active=True,
             is_published=True,
             category__is_active=True
-        ).annotate(
-            avg_rating=Avg("reviews__rating",distinct=True),
-            review_count=Count("reviews",distinct=True),
-            total_duration=Sum("modules__lessons__duration"),
-        )
+        ).select_related(
+            "instructor","category"
+        ).annotate(**course_stats_annotations())
 
-class ApprovedCourseDetailView(generics.RetrieveAPIView):
+class ApprovedCourseDetailView(AnonymousResponseCacheMixin,generics.RetrieveAPIView):
     serializer_class = UserCourseDetailSerializer
     permission_classes =[permissions.AllowAny]
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["viewer"] = ViewerContext(self.request.user)
+        return context
+
+    def retrieve(self, request, *args, **kwargs):
+        course_id = kwargs["pk"]
+        build = super().retrieve
+        return self.cached_response(
+            "course_detail",
+            course_id,
+            lambda: build(request, *args, **kwargs),
+            tags=["course_detail", f"course:{course_id}"]
+        )
+
     def get_queryset(self):
         return Course.objects.filter(
             is_active=True,
             is_published=True,
             category__is_active=True
-        ).annotate(
-            avg_rating=Avg("reviews__rating",distinct=True),
-            review_count=Count("reviews",distinct=True),
-            total_duration=Sum("modules__lessons__duration"),
-        )
+        ).select_related(
+            "instructor__profile","category","final_quiz"
+        ).prefetch_related(
+            *get_course_content_prefetch()
+        ).annotate(**course_stats_annotations())
 
 class MyEnrolledCourseDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserCourseDetailSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["viewer"] = ViewerContext(self.request.user)
+        return context
+
     def get_queryset(self):
         return Course.objects.filter(
             purchases__student=self.request.user,
             is_active=True,
-        ).annotate(
-            avg_rating = Avg("reviews__rating",distinct=True),
-            review_count = Count("reviews",distinct=True),
-            total_duration=Sum("modules__lessons__duration") 
-        ).distinct()  
+        ).select_related(
+            "instructor__profile","category","final_quiz"
+        ).prefetch_related(
+            *get_course_content_prefetch()
+        ).annotate(**course_stats_annotations()).distinct()  
     
 class ProfileView(APIView):
     permission_classes=[IsAuthenticated]
@@ -343,10 +375,20 @@ class StudentPortfolioAPIView(APIView):
 
     def get(self, request):
         student = request.user
+        cache_key = get_portfolio_cache_key(student.id)
 
-        purchases = CoursePurchase.objects.filter(student=student).select_related("course")
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.build_portfolio(student)
+            cache.set(cache_key, data, PORTFOLIO_CACHE_TIMEOUT)
 
-        total_enrolled = purchases.count()
+        return Response(data, status=status.HTTP_200_OK)
+
+    def build_portfolio(self, student):
+        purchases = list(CoursePurchase.objects.filter(student=student).select_related("course"))
+        progress_map = get_course_progress_map(student, purchases)
+
+        total_enrolled = len(purchases)
         completed_courses = 0
         ongoing_courses = 0
 
@@ -354,58 +396,35 @@ class StudentPortfolioAPIView(APIView):
         total_progress_sum = 0
         overall_quiz_percentages = []
 
-        all_attempts = UserQuizAttempt.objects.filter(user=student)
+        quiz_stats = {}
+        best_attempts = (
+            UserQuizAttempt.objects.filter(user=student)
+            .values("quiz_id", "quiz__course_id")
+            .annotate(
+                best_percentage=Max("percentage"),
+                passed_count=Count("id", filter=Q(is_passed=True))
+            )
+        )
+        for item in best_attempts:
+            stats = quiz_stats.setdefault(item["quiz__course_id"], {"percentages": [], "passed": False})
+            stats["percentages"].append(item["best_percentage"])
+            stats["passed"] = stats["passed"] or item["passed_count"] > 0
 
         for purchase in purchases:
             course = purchase.course
-
-            if purchase.progress_locked:
-                progress = 100
-            else:
-                total_lessons = Lesson.objects.filter(
-                    module__course=course,
-                    duration__gt=0,
-                    is_deleted=False,
-                    is_active=True,
-                    created_at__lte=purchase.purchased_at  
-                ).count()
-
-                completed_lessons = LessonProgress.objects.filter(
-                    student=student,
-                    lesson__module__course=course,
-                    lesson__duration__gt=0,
-                    completed=True,
-                    lesson__created_at__lte=purchase.purchased_at  
-                ).count()
-
-                progress = 0
-                if total_lessons > 0:
-                    progress = round((completed_lessons / total_lessons) * 100, 2)
+            progress = progress_map.get(course.id, 0)
 
             total_progress_sum += progress
 
-            quiz_attempts = all_attempts.filter(
-                quiz__course=course
-            )
-
             quiz_average = 0
             quiz_passed = False
 
-            if quiz_attempts.exists():
-
-                quiz_passed = quiz_attempts.filter(is_passed=True).exists()
-
-                best_attempts = (
-                    quiz_attempts
-                    .values("quiz")
-                    .annotate(best_percentage=Max("percentage"))
-                )
-
-                percentages = [item["best_percentage"] for item in best_attempts]
-
-                if percentages:
-                    quiz_average = round(sum(percentages) / len(percentages), 2)
-                    overall_quiz_percentages.extend(percentages)
+            stats = quiz_stats.get(course.id)
+            if stats:
+                quiz_passed = stats["passed"]
+                percentages = stats["percentages"]
+                quiz_average = round(sum(percentages) / len(percentages), 2)
+                overall_quiz_percentages.extend(percentages)
 
             if progress >= 100 and quiz_passed:
                 completed_courses += 1
@@ -451,7 +470,7 @@ class StudentPortfolioAPIView(APIView):
                 "issued_at": cert.issued_at
             })
 
-        return Response({
+        return {
             "profile": {
                 "name": student.username,
                 "email": student.email,
@@ -461,10 +480,10 @@ class StudentPortfolioAPIView(APIView):
                 "total_enrolled": total_enrolled,
                 "completed": completed_courses,
                 "ongoing": ongoing_courses,
-                "certificates": certificates.count(),
+                "certificates": len(certificate_data),
                 "overall_progress": overall_progress,
                 "overall_quiz_average": overall_quiz_average
             },
             "courses": course_data,
             "certificates": certificate_data
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }
@@ -1,5 +1,7 @@
 import { useCallback, useEffect, useRef, useState } from "react";
 
+const MAX_REACTIONS_PER_EMOJI = 5;
+
 const useLiveSessionSocket = (sessionId) => {
   const socketRef = useRef(null);
 
@@ -91,26 +93,30 @@ const useLiveSessionSocket = (sessionId) => {
         return;
       }
 
-      if (data.type === "hand") {
+      if (data.type === "hands") {
+        const raised = new Map(data.hands.map((h) => [h.user_id, h.hand_raised]));
         setParticipants((prev) =>
           prev.map((p) =>
-            p.user_id === data.user_id
-              ? { ...p, hand_raised: data.hand_raised }
+            raised.has(p.user_id)
+              ? { ...p, hand_raised: raised.get(p.user_id) }
               : p
           )
         );
         return;
       }
 
-      if (data.type === "reaction") {
-        const reaction = {
-          ...data,
-          id: `${Date.now()}-${Math.random()}`,
-          x: Math.random() * 80 + 10,
-        };
-        setReactions((prev) => [...prev, reaction]);
+      if (data.type === "reactions") {
+        const batch = Object.entries(data.counts).flatMap(([emoji, count]) =>
+          Array.from({ length: Math.min(count, MAX_REACTIONS_PER_EMOJI) }, () => ({
+            emoji,
+            id: `${Date.now()}-${Math.random()}`,
+            x: Math.random() * 80 + 10,
+          }))
+        );
+        const ids = new Set(batch.map((r) => r.id));
+        setReactions((prev) => [...prev, ...batch]);
         setTimeout(() => {
-          setReactions((prev) => prev.filter((r) => r.id !== reaction.id));
+          setReactions((prev) => prev.filter((r) => !ids.has(r.id)));
         }, 3000);
         return;
       }
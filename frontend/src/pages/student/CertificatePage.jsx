@@ -4,6 +4,7 @@ import { Card, CardContent } from "@/components/ui/Card";
 import { Download } from "lucide-react";
 import axiosInstance from "../../api/axiosInstance";
 import { extractResults } from "../../api/api";
+import { toast } from "react-toastify";
 
 export default function CertificatePage() {
   const [certificates, setCertificates] = useState([]);
@@ -26,6 +27,11 @@ export default function CertificatePage() {
         responseType: "blob",
       });
 
+      if (res.status === 202) {
+        toast.info("Your certificate is still being generated. Please try again in a moment.");
+        return;
+      }
+
       const url = window.URL.createObjectURL(new Blob([res.data]));
       const link = document.createElement("a");
       link.href = url;
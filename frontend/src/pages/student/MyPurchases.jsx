@@ -5,6 +5,8 @@ import { useNavigate } from "react-router-dom";
 import { toast } from "react-toastify";
 import Pagination from "../../components/ui/Pagination";
 
+const INVOICE_POLL_MS = 3000;
+
 const MyPurchases = () => {
   const [orders, setOrders] = useState([]);
   const [page,setPage] = useState(1);
@@ -23,6 +25,20 @@ const MyPurchases = () => {
     fetchOrders();
   }, [page]);
 
+  const invoicePending = orders.some(
+    (o) => o.status === "completed" && o.invoice_status === "pending"
+  );
+
+  useEffect(() => {
+    if (!invoicePending) return;
+
+    const timer = setTimeout(async () => {
+      const res = await axiosInstance.get("/payment/orders/",{params:{page}});
+      setOrders(extractResults(res));
+    }, INVOICE_POLL_MS);
+    return () => clearTimeout(timer);
+  }, [invoicePending, orders, page]);
+
   const handleRetry = async (order) => {
     if (retryingId) return;
     try {
@@ -77,20 +93,33 @@ const MyPurchases = () => {
   const downloadInvoice = async (invoiceId) => {
     if (!invoiceId) return;
 
-    const res = await axiosInstance.get(
-      `/payment/invoices/${invoiceId}/download/`,
-      { responseType: "blob" }
-    );
+    // Open the tab synchronously in the click handler; a window.open after the
+    // await would no longer count as a user gesture and gets popup-blocked.
+    const tab = window.open("", "_blank");
+    if (tab) tab.opener = null;
 
-    const blob = new Blob([res.data], { type: "application/pdf" });
-    const url = URL.createObjectURL(blob);
-
-    const a = document.createElement("a");
-    a.href = url;
-    a.download = `invoice-${invoiceId}.pdf`;
-    a.click();
-
-    URL.revokeObjectURL(url);
+    try {
+      const res = await axiosInstance.get(`/payment/invoices/${invoiceId}/view/`);
+
+      if (res.status === 202) {
+        tab?.close();
+        toast.info("Your invoice is being generated, please try again shortly");
+        setOrders((prev) =>
+          prev.map((o) => (o.invoice_id === invoiceId ? { ...o, invoice_status: "pending" } : o))
+        );
+        return;
+      }
+
+      // The PDF comes straight from the CDN instead of being proxied through the API.
+      if (tab) {
+        tab.location.href = res.data.pdf_url;
+      } else {
+        window.location.assign(res.data.pdf_url);
+      }
+    } catch (err) {
+      tab?.close();
+      toast.error(err.response?.data?.error || "Could not open the invoice");
+    }
   };
 
   if (!orders.length) {
@@ -144,7 +173,11 @@ const MyPurchases = () => {
 
                 <td className="p-2 sm:p-3">
                   <div className="flex flex-col sm:flex-row gap-2">
-                    {o.status === "completed" && o.invoice_id && (
+                    {o.status === "completed" && o.invoice_id && o.invoice_status === "pending" && (
+                      <span className="text-xs text-gray-500">Generating invoice…</span>
+                    )}
+
+                    {o.status === "completed" && o.invoice_id && o.invoice_status !== "pending" && (
                       <button
                         onClick={() => downloadInvoice(o.invoice_id)}
                         className="bg-indigo-600 text-white px-3 py-1 rounded"